@@ -0,0 +1,85 @@
+"""
+ProbeResult热点查询的执行计划与耗时对比
+
+对每条热点查询分别执行：
+- before: IGNORE INDEX 强制不使用迁移1新增的组合索引（相当于迁移前）
+- after:  正常执行
+
+用法（在backend目录下，使用db.py中的MySQL连接配置）：
+    python -m benchmarks.probe_query_plans --project <project_ms_id> [--repeat 20]
+"""
+import argparse
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import text
+
+from db import engine
+
+
+NEW_INDEXES = "ix_probe_result_project_valid_start, ix_probe_result_project_start"
+
+# {hint} 处插入索引提示
+HOT_QUERIES = {
+    "downtime scan (SLO calculator)": (
+        "SELECT * FROM proberesult {hint} "
+        "WHERE project_ms_id = :project AND is_valid = 1 AND start_time >= :start AND start_time < :end "
+        "ORDER BY start_time ASC"
+    ),
+    "events page (/slo/screen/events)": (
+        "SELECT * FROM proberesult {hint} "
+        "WHERE project_ms_id = :project AND is_valid = 1 AND start_time >= :start AND start_time <= :end "
+        "ORDER BY start_time DESC LIMIT 20"
+    ),
+    "valid probe count (/slo/analysis/data)": (
+        "SELECT COUNT(id) FROM proberesult {hint} "
+        "WHERE project_ms_id = :project AND is_valid = 1 AND start_time >= :start AND start_time < :end"
+    ),
+    "results page (/probe/results)": (
+        "SELECT * FROM proberesult {hint} "
+        "WHERE project_ms_id = :project ORDER BY start_time DESC LIMIT 10"
+    ),
+    "sync pointer (latest result)": (
+        "SELECT * FROM proberesult {hint} "
+        "WHERE project_ms_id = :project ORDER BY start_time DESC LIMIT 1"
+    ),
+}
+
+
+def _explain(conn, sql: str, params: dict) -> list:
+    result = conn.execute(text("EXPLAIN " + sql), params)
+    keys = list(result.keys())
+    return [dict(zip(keys, row)) for row in result]
+
+
+def _timed(conn, sql: str, params: dict, repeat: int) -> float:
+    started = time.perf_counter()
+    for _ in range(repeat):
+        conn.execute(text(sql), params).fetchall()
+    return (time.perf_counter() - started) / repeat * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--project", required=True, help="Metersphere project id")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    now = datetime.utcnow()
+    params = {"project": args.project, "start": datetime(now.year, 1, 1), "end": now + timedelta(seconds=1)}
+
+    with engine.connect() as conn:
+        for label, template in HOT_QUERIES.items():
+            print(f"== {label}")
+            for phase, hint in (("before", f"IGNORE INDEX ({NEW_INDEXES})"), ("after", "")):
+                sql = template.format(hint=hint)
+                for row in _explain(conn, sql, params):
+                    print(
+                        f"  [{phase:6}] type={row.get('type')} key={row.get('key')} "
+                        f"rows={row.get('rows')} extra={row.get('Extra')}"
+                    )
+                print(f"  [{phase:6}] avg {_timed(conn, sql, params, args.repeat):.2f} ms over {args.repeat} runs")
+
+
+if __name__ == "__main__":
+    main()
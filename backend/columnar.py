@@ -0,0 +1,37 @@
+from datetime import datetime, timezone
+from typing import Iterable, List, Sequence
+
+
+def _epoch_ms(value):
+    if isinstance(value, datetime):
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return int(value.timestamp() * 1000)
+    return value
+
+
+def _is_int_column(values: list) -> bool:
+    return bool(values) and all(isinstance(v, int) and not isinstance(v, bool) for v in values)
+
+
+def to_columnar(fields: Sequence[str], rows: Iterable[Sequence], delta: bool = False) -> dict:
+    """Turn rows into parallel arrays, one per field.
+
+    Datetimes become epoch milliseconds (UTC). With delta=True every integer
+    column (timestamps, ids, counters) keeps its first value and then only the
+    difference to the previous one; the client restores it with a running sum.
+    Columns containing nulls, floats or strings are never delta-encoded.
+    """
+    rows = list(rows)
+    columns = {name: [_epoch_ms(row[i]) for row in rows] for i, name in enumerate(fields)}
+    delta_encoded: List[str] = []
+    if delta:
+        for name, values in columns.items():
+            if len(values) > 1 and _is_int_column(values):
+                columns[name] = [values[0]] + [b - a for a, b in zip(values, values[1:])]
+                delta_encoded.append(name)
+    return {"length": len(rows), "columns": columns, "delta": delta_encoded}
+
+
+def records_to_columnar(records: List[dict], fields: Sequence[str], delta: bool = False) -> dict:
+    return to_columnar(fields, ([record[name] for name in fields] for record in records), delta)
@@ -1,6 +1,8 @@
 import os
-from typing import Iterator
+from typing import AsyncIterator, Iterator
+from sqlalchemy.ext.asyncio import create_async_engine
 from sqlmodel import Session, create_engine
+from sqlmodel.ext.asyncio.session import AsyncSession
 
 
 MYSQL_USER = os.getenv("MYSQL_USER", "deepslo")
@@ -16,9 +18,72 @@ DATABASE_URL = (
 
 engine = create_engine(DATABASE_URL, pool_pre_ping=True)
 
+# Optional read replica for dashboard traffic. Unset MYSQL_READ_HOST keeps
+# reads on the primary, but still through their own connection pool so they
+# never queue behind ingest writes and SLO recompute commits.
+MYSQL_READ_HOST = os.getenv("MYSQL_READ_HOST")
+MYSQL_READ_PORT = os.getenv("MYSQL_READ_PORT", MYSQL_PORT)
+MYSQL_READ_USER = os.getenv("MYSQL_READ_USER", MYSQL_USER)
+MYSQL_READ_PASSWORD = os.getenv("MYSQL_READ_PASSWORD", MYSQL_PASSWORD)
+MYSQL_READ_POOL_SIZE = int(os.getenv("MYSQL_READ_POOL_SIZE", "10"))
+MYSQL_READ_MAX_OVERFLOW = int(os.getenv("MYSQL_READ_MAX_OVERFLOW", "20"))
+MYSQL_READ_POOL_RECYCLE = int(os.getenv("MYSQL_READ_POOL_RECYCLE", "1800"))
+
+READ_DATABASE_URL = (
+    f"mysql+pymysql://{MYSQL_READ_USER}:{MYSQL_READ_PASSWORD}@{MYSQL_READ_HOST or MYSQL_HOST}:{MYSQL_READ_PORT}/{MYSQL_DB}"
+    "?charset=utf8mb4"
+)
+
+read_engine = create_engine(
+    READ_DATABASE_URL,
+    pool_pre_ping=True,
+    pool_size=MYSQL_READ_POOL_SIZE,
+    max_overflow=MYSQL_READ_MAX_OVERFLOW,
+    pool_recycle=MYSQL_READ_POOL_RECYCLE,
+)
+
+# Async driver on the same read database for the dashboard/list routes, so
+# they wait on the network without holding a worker thread. ASYNC_DATABASE_URL
+# overrides the whole URL (e.g. sqlite+aiosqlite:///... in tests).
+ASYNC_READ_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or READ_DATABASE_URL.replace(
+    "mysql+pymysql://", "mysql+aiomysql://", 1
+)
+
+_async_pool_options = dict(
+    pool_size=MYSQL_READ_POOL_SIZE,
+    max_overflow=MYSQL_READ_MAX_OVERFLOW,
+    pool_recycle=MYSQL_READ_POOL_RECYCLE,
+) if ASYNC_READ_DATABASE_URL.startswith("mysql") else {}
+
+async_read_engine = create_async_engine(ASYNC_READ_DATABASE_URL, pool_pre_ping=True, **_async_pool_options)
+
+# Async driver on the primary, for reads that must not lag behind writes
+# (credentials at login). Shares the ASYNC_DATABASE_URL override.
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or DATABASE_URL.replace(
+    "mysql+pymysql://", "mysql+aiomysql://", 1
+)
+
+async_engine = create_async_engine(ASYNC_DATABASE_URL, pool_pre_ping=True)
+
 
 def get_session() -> Iterator[Session]:
     with Session(engine) as session:
         yield session
 
 
+def get_read_session() -> Iterator[Session]:
+    """Session for read-only routes; never commit through it."""
+    with Session(read_engine) as session:
+        yield session
+
+
+async def get_async_session() -> AsyncIterator[AsyncSession]:
+    """Async session on the primary database."""
+    async with AsyncSession(async_engine, expire_on_commit=False) as session:
+        yield session
+
+
+async def get_async_read_session() -> AsyncIterator[AsyncSession]:
+    """Async session for read-only routes; never commit through it."""
+    async with AsyncSession(async_read_engine, expire_on_commit=False) as session:
+        yield session
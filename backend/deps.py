@@ -1,4 +1,7 @@
-from typing import Optional
+import os
+import threading
+import time
+from typing import Dict, Optional, Tuple
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import jwt, JWTError
@@ -11,6 +14,34 @@ from security import SECRET_KEY, ALGORITHM
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
 
+# Seconds an authenticated User is served from memory; 0 disables the cache.
+# Changes made through routers/users.py invalidate immediately, this only
+# bounds staleness for edits made elsewhere (other workers, direct SQL).
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", "30"))
+
+_user_cache: Dict[int, Tuple[float, User]] = {}
+_user_cache_lock = threading.Lock()
+
+
+def _cached_user(user_id: int) -> Optional[User]:
+    with _user_cache_lock:
+        hit = _user_cache.get(user_id)
+        if hit is None:
+            return None
+        if hit[0] <= time.monotonic():
+            del _user_cache[user_id]
+            return None
+        return hit[1]
+
+
+def invalidate_user_cache(user_id: Optional[int] = None) -> None:
+    """Drop one cached user (or all of them) after it was changed or deleted."""
+    with _user_cache_lock:
+        if user_id is None:
+            _user_cache.clear()
+        else:
+            _user_cache.pop(user_id, None)
+
 
 def get_current_user(token: str = Depends(oauth2_scheme), session=Depends(get_session)) -> User:
     credentials_exception = HTTPException(
@@ -25,9 +56,17 @@ def get_current_user(token: str = Depends(oauth2_scheme), session=Depends(get_se
             raise credentials_exception
     except JWTError:
         raise credentials_exception
-    user = session.get(User, int(subject))
+    user_id = int(subject)
+    user = _cached_user(user_id)
+    if user is not None:
+        return user
+    user = session.get(User, user_id)
     if user is None or not user.is_active:
         raise credentials_exception
+    if USER_CACHE_TTL > 0:
+        # a detached copy, so no request can lazy-load or flush through another's session
+        with _user_cache_lock:
+            _user_cache[user_id] = (time.monotonic() + USER_CACHE_TTL, User(**user.model_dump()))
     return user
 
 
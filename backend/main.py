@@ -2,6 +2,7 @@ import os
 from pathlib import Path
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 
 
 from routers import auth as auth_router
@@ -15,10 +16,19 @@ from routers import slo_settings as slo_settings_router
 from routers import slo_screen as slo_screen_router
 from routers import slo_analysis as slo_analysis_router
 from bootstrap import ensure_admin_user, create_db_and_tables
+from db import engine
+from middleware import SelectiveGZipMiddleware
+from migrations import run_migrations
 from services.sync_runner import start_background_sync_loop
 from services.slo_scheduler import start_slo_scheduler
+from services.probe_archive import start_retention_job
+from services.probe_buckets import start_bucket_backfill_job
+from services.slo_refresh import start_slo_refresh_worker
 
-app = FastAPI(title="DeepSLO API", version="0.1.0")
+app = FastAPI(title="DeepSLO API", version="0.1.0", default_response_class=ORJSONResponse)
+
+# 压缩较大的JSON响应（结果列表、分析数据），SSE推送流和gzip下载不压缩
+app.add_middleware(SelectiveGZipMiddleware, minimum_size=1024, compresslevel=5)
 
 app.add_middleware(
     CORSMiddleware,
@@ -32,9 +42,13 @@ app.add_middleware(
 @app.on_event("startup")
 def on_startup() -> None:
     create_db_and_tables()
+    run_migrations(engine)
     ensure_admin_user()
-    start_background_sync_loop(interval_seconds=30)
+    start_background_sync_loop()
     start_slo_scheduler(interval_hours=1)  # 每小时计算一次SLO
+    start_slo_refresh_worker()
+    start_retention_job(interval_hours=24)  # 每天归档超过保留期的拨测结果
+    start_bucket_backfill_job()  # 后台逐月补算历史拨测数据的小时汇总
 
 
 app.include_router(auth_router.router, prefix="/auth", tags=["auth"]) 
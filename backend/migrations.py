@@ -0,0 +1,70 @@
+"""
+数据库版本化迁移
+
+create_all 只会创建缺失的表，无法给已有表补索引/字段。
+启动时按版本号顺序执行尚未应用的迁移，已应用的版本记录在 schemamigration 表中。
+新增迁移：在 MIGRATIONS 末尾追加 (版本号, 描述, 函数)，版本号只增不改。
+"""
+from datetime import datetime
+from typing import Callable, List, Sequence, Tuple
+
+from sqlalchemy import inspect
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.exc import IntegrityError, OperationalError
+from sqlmodel import Session, select
+
+from models import SchemaMigration
+
+
+def _index_exists(conn: Connection, table: str, name: str) -> bool:
+    return any(ix["name"] == name for ix in inspect(conn).get_indexes(table))
+
+
+def _create_index_if_missing(conn: Connection, table: str, name: str, columns: Sequence[str]) -> None:
+    if _index_exists(conn, table, name):
+        return
+    cols = ", ".join(columns)
+    try:
+        conn.exec_driver_sql(f"CREATE INDEX {name} ON {table} ({cols})")
+    except OperationalError:
+        # 另一个worker可能刚好建好了同名索引
+        if not _index_exists(conn, table, name):
+            raise
+
+
+def _m1_probe_result_indexes(conn: Connection) -> None:
+    """ProbeResult热点查询的组合索引：项目+有效性+时间范围 / 项目+时间排序"""
+    _create_index_if_missing(
+        conn, "proberesult", "ix_probe_result_project_valid_start", ["project_ms_id", "is_valid", "start_time"]
+    )
+    _create_index_if_missing(
+        conn, "proberesult", "ix_probe_result_project_start", ["project_ms_id", "start_time"]
+    )
+
+
+MIGRATIONS: List[Tuple[int, str, Callable[[Connection], None]]] = [
+    (1, "probe result composite indexes", _m1_probe_result_indexes),
+]
+
+
+def run_migrations(engine: Engine) -> List[int]:
+    """执行所有未应用的迁移，返回本次执行的版本号"""
+    with Session(engine) as session:
+        applied = set(session.exec(select(SchemaMigration.version)).all())
+
+    executed = []
+    for version, description, migrate in MIGRATIONS:
+        if version in applied:
+            continue
+        with engine.begin() as conn:
+            migrate(conn)
+        with Session(engine) as session:
+            session.add(SchemaMigration(version=version, description=description, applied_at=datetime.utcnow()))
+            try:
+                session.commit()
+            except IntegrityError:
+                # 并发启动时另一个worker已记录该版本
+                session.rollback()
+        executed.append(version)
+        print(f"Applied migration {version}: {description}")
+    return executed
@@ -1,6 +1,6 @@
 from typing import Optional
 from datetime import datetime
-from sqlmodel import SQLModel, Field, Column, String, UniqueConstraint
+from sqlmodel import SQLModel, Field, Column, String, UniqueConstraint, Index
 
 
 class User(SQLModel, table=True):
@@ -108,6 +108,9 @@ class ProbeResult(SQLModel, table=True):
 
     __table_args__ = (
         UniqueConstraint("report_id", name="uq_probe_result_report_id"),
+        # 热点查询：按项目+有效性+时间范围，及按项目+时间排序（见migrations.py）
+        Index("ix_probe_result_project_valid_start", "project_ms_id", "is_valid", "start_time"),
+        Index("ix_probe_result_project_start", "project_ms_id", "start_time"),
     )
 
 
@@ -154,4 +157,62 @@ class SLORecord(SQLModel, table=True):
 
     __table_args__ = (
         UniqueConstraint("project_ms_id", "period_type", "period_value", name="uq_slo_record"),
-    )
\ No newline at end of file
+    )
+
+
+class ProbeArchive(SQLModel, table=True):
+    id: Optional[int] = Field(default=None, primary_key=True)
+    # 项目ID
+    project_ms_id: str = Field(sa_column=Column(String(64), nullable=False))
+    # 归档月份，如 "2024-03"
+    period_value: str = Field(sa_column=Column(String(20), nullable=False))
+    # 归档文件路径（gzip压缩的NDJSON）
+    path: str = Field(sa_column=Column(String(512), nullable=False))
+    row_count: int = 0
+    min_start_time: Optional[datetime] = None
+    max_start_time: Optional[datetime] = None
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+
+    __table_args__ = (
+        UniqueConstraint("project_ms_id", "period_value", name="uq_probe_archive_period"),
+    )
+
+
+class ProbeHourlyBucket(SQLModel, table=True):
+    id: Optional[int] = Field(default=None, primary_key=True)
+    # 项目ID
+    project_ms_id: str = Field(sa_column=Column(String(64), nullable=False))
+    # 小时起点（UTC，整点）
+    bucket_start: datetime
+    # 该小时内的拨测次数
+    probe_count: int = 0
+    # 该小时内的失败次数（is_valid=1）
+    failed_count: int = 0
+    # 中断时间（秒），连续失败计入前一次失败所在的小时
+    downtime_seconds: float = 0.0
+    updated_at: Optional[datetime] = None
+
+    __table_args__ = (
+        UniqueConstraint("project_ms_id", "bucket_start", name="uq_probe_hourly_bucket"),
+    )
+
+
+class ProbeBucketBackfill(SQLModel, table=True):
+    # 已补算小时汇总的 项目+月份，补算任务中断后从未记录的月份继续
+    id: Optional[int] = Field(default=None, primary_key=True)
+    project_ms_id: str = Field(sa_column=Column(String(64), nullable=False))
+    # 月份，如 "2024-03"
+    period_value: str = Field(sa_column=Column(String(20), nullable=False))
+    completed_at: Optional[datetime] = None
+
+    __table_args__ = (
+        UniqueConstraint("project_ms_id", "period_value", name="uq_probe_bucket_backfill"),
+    )
+
+
+class SchemaMigration(SQLModel, table=True):
+    # 已执行的迁移版本
+    version: int = Field(primary_key=True, sa_column_kwargs={"autoincrement": False})
+    description: str = Field(sa_column=Column(String(255), nullable=False))
+    applied_at: Optional[datetime] = None
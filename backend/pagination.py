@@ -0,0 +1,36 @@
+import base64
+from datetime import datetime
+from typing import Optional, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import and_, or_
+
+
+def encode_cursor(start_time: datetime, row_id: int) -> str:
+    raw = f"{start_time.isoformat()}|{row_id}".encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        start_time, row_id = base64.urlsafe_b64decode(padded).decode("utf-8").split("|")
+        return datetime.fromisoformat(start_time), int(row_id)
+    except (ValueError, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def keyset_before(stmt, time_col, id_col, cursor: Optional[str]):
+    """Restrict a (time desc, id desc) ordered query to rows after the cursor."""
+    if not cursor:
+        return stmt
+    start_time, row_id = decode_cursor(cursor)
+    return stmt.where(or_(time_col < start_time, and_(time_col == start_time, id_col < row_id)))
+
+
+def next_cursor(rows: list, page_size: int) -> Optional[str]:
+    """Cursor for the following page; rows must be fetched with limit page_size + 1."""
+    if len(rows) <= page_size:
+        return None
+    last = rows[page_size - 1]
+    return encode_cursor(last.start_time, last.id)
@@ -1,26 +1,46 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
-from db import get_session
+from db import get_async_session
 from models import User
 from schemas import Token
-from security import create_access_token, verify_password
+from security import create_access_token
+from services import login_guard
 
 
 router = APIRouter()
 
 
 @router.post("/login", response_model=Token)
-def login(
+async def login(
     form_data: OAuth2PasswordRequestForm = Depends(),
-    session=Depends(get_session),
+    # 读主库：修改密码后旧密码立即失效，不受只读副本延迟影响
+    session: AsyncSession = Depends(get_async_session),
 ):
+    wait = login_guard.retry_after(form_data.username)
+    if wait is not None:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many failed login attempts",
+            headers={"Retry-After": str(wait)},
+        )
     statement = select(User).where(User.username == form_data.username)
-    user = session.exec(statement).first()
-    if not user or not verify_password(form_data.password, user.hashed_password):
+    user = (await session.exec(statement)).first()
+    try:
+        ok = user is not None and await login_guard.verify_password_async(
+            form_data.username, form_data.password, user.hashed_password
+        )
+    except login_guard.LoginBusy:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Login is busy, retry shortly",
+            headers={"Retry-After": "1"},
+        )
+    if not ok:
+        login_guard.record_failure(form_data.username)
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
+    login_guard.record_success(form_data.username)
     access_token = create_access_token(subject=str(user.id))
     return Token(access_token=access_token)
-
-
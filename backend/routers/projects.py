@@ -1,4 +1,3 @@
-from datetime import datetime
 from typing import List
 from fastapi import APIRouter, Depends, HTTPException
 from sqlmodel import select
@@ -8,6 +7,7 @@ from deps import get_current_user, require_admin
 from models import Project, MSConfig, User
 from schemas import ProjectOut
 from services.ms_client import MSClient
+from services.project_sync import fetch_all_projects, sync_projects_and_probes, upsert_projects
 
 
 router = APIRouter()
@@ -19,55 +19,30 @@ def list_projects(_: User = Depends(get_current_user), session=Depends(get_sessi
     return [ProjectOut(**p.model_dump()) for p in projects]  # type: ignore[arg-type]
 
 
-@router.post("/sync")
-def sync_projects(_: User = Depends(require_admin), session=Depends(get_session)):
+def _ensure_ms_client(session) -> MSClient:
     ms_cfg = session.exec(select(MSConfig).where(MSConfig.active == True)).first()  # noqa: E712
     if not ms_cfg:
         raise HTTPException(status_code=400, detail="Metersphere not configured")
+    return MSClient(base_url=ms_cfg.url, ak=ms_cfg.ak, sk=ms_cfg.sk)
 
-    client = MSClient(base_url=ms_cfg.url, ak=ms_cfg.ak, sk=ms_cfg.sk)
-    payload = {
-        "current": 1,
-        "pageSize": 100,
-        "sort": {},
-        "keyword": "",
-        "viewId": "",
-        "combineSearch": {"searchMode": "AND", "conditions": []},
-        "filter": {},
-    }
-    resp = client.post("/system/project/page", json=payload)
-    if resp.status_code != 200:
-        raise HTTPException(status_code=resp.status_code, detail=f"MS error: {resp.text}")
-
-    data = resp.json()
-    if data.get("code") != 100200:
-        raise HTTPException(status_code=400, detail=f"MS response error: {data}")
-
-    items = data.get("data", {}).get("list", [])
-    upserted = 0
-    for item in items:
-        ms_id = str(item.get("id"))
-        proj = session.exec(select(Project).where(Project.ms_id == ms_id)).first()
-        ms_name = item.get("name") or ""
-        ms_description = item.get("description") or None
-        create_ts = item.get("createTime")
-        ms_createtime = None
-        if isinstance(create_ts, (int, float)):
-            try:
-                ms_createtime = datetime.utcfromtimestamp(int(create_ts) / 1000)
-            except Exception:
-                ms_createtime = None
 
-        if proj is None:
-            proj = Project(ms_id=ms_id, ms_name=ms_name)
-        proj.ms_name = ms_name
-        proj.ms_description = ms_description
-        proj.ms_createtime = ms_createtime
-
-        session.add(proj)
-        upserted += 1
-
-    session.commit()
+@router.post("/sync")
+def sync_projects(_: User = Depends(require_admin), session=Depends(get_session)):
+    client = _ensure_ms_client(session)
+    try:
+        items = fetch_all_projects(client)
+    except RuntimeError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    upserted = upsert_projects(session, items)
     return {"ok": True, "count": upserted}
 
 
+@router.post("/sync-all")
+def sync_projects_with_probes(_: User = Depends(require_admin), session=Depends(get_session)):
+    """Sync every project and each project's probe scenario in one job."""
+    client = _ensure_ms_client(session)
+    try:
+        result = sync_projects_and_probes(session, client)
+    except RuntimeError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"ok": True, **result}
@@ -1,30 +1,37 @@
 from datetime import datetime, timedelta, timezone
-import time
-from typing import Optional
+from typing import Optional, Union
 
 from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlmodel import select
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from sqlmodel import func, select, update
+from sqlmodel.ext.asyncio.session import AsyncSession
 
-from db import get_session
+from columnar import to_columnar
+from db import get_async_read_session, get_session
 from deps import get_current_user, require_admin
-from models import ProbeSyncConfig, ProbeResult, MSConfig, ProbeConfig
+from models import ProbeSyncConfig, ProbeResult, MSConfig
+from pagination import keyset_before, next_cursor
 from schemas import (
     ProbeSyncConfigCreate,
     ProbeSyncConfigUpdate,
     ProbeSyncConfigOut,
     PaginatedProbeResults,
+    ColumnarProbeResults,
     ProbeResultOut,
+    ProbeIngestPayload,
+    ProbeResultBulkUpdate,
 )
+from services import probe_export, response_cache
 from services.ms_client import MSClient
+from services.probe_archive import archived_before
+from services.probe_buckets import refresh_hourly_buckets_quietly
+from services.slo_refresh import enqueue_slo_refresh
+from services.sync_runner import ingest_reports, notify_written, reload_sync_schedule, run_sync_config
 
 
 router = APIRouter()
 
 
-def _now_ms() -> int:
-    return int(round(time.time() * 1000))
-
-
 def _dt_now() -> datetime:
     return datetime.utcnow()
 
@@ -84,6 +91,7 @@ def upsert_sync_config(
     session.add(cfg)
     session.commit()
     session.refresh(cfg)
+    reload_sync_schedule()
     return ProbeSyncConfigOut(
         id=cfg.id,  # type: ignore[arg-type]
         project_ms_id=cfg.project_ms_id,
@@ -125,6 +133,7 @@ def update_sync_config(
     session.add(cfg)
     session.commit()
     session.refresh(cfg)
+    reload_sync_schedule()
     return ProbeSyncConfigOut(
         id=cfg.id,  # type: ignore[arg-type]
         project_ms_id=cfg.project_ms_id,
@@ -158,121 +167,188 @@ def run_sync_now(
     if cfg is None:
         raise HTTPException(status_code=404, detail="Sync config not found")
 
-    # determine start
-    start_dt = cfg.last_synced_start or cfg.start_time
-    if start_dt is None:
-        probe = session.exec(select(ProbeConfig).where(ProbeConfig.project_ms_id == project_ms_id)).first()
-        if probe and probe.create_time:
-            start_dt = probe.create_time
-        else:
-            start_dt = datetime.utcfromtimestamp((_now_ms() - 3600 * 1000) / 1000)
-    start_ms = int(start_dt.timestamp() * 1000)
-    end_ms = _now_ms() + 1
-
     try:
-        total_saved = _sync_window(session, client, project_ms_id, start_ms, end_ms)
-        cfg.last_run_at = _dt_now()
-        cfg.last_status = "SUCCESS"
-        # update pointer to latest record startTime + 1ms if any saved
-        latest = session.exec(
-            select(ProbeResult)
-            .where(ProbeResult.project_ms_id == project_ms_id)
-            .order_by(ProbeResult.start_time.desc())
-        ).first()
-        if latest:
-            cfg.last_synced_start = latest.start_time + timedelta(milliseconds=1)
-        cfg.last_error = None
-        cfg.updated_at = _dt_now()
-        session.add(cfg)
-        session.commit()
-        return {"saved": total_saved, "start": start_ms, "end": end_ms}
-    except Exception as e:  # noqa: BLE001
-        cfg.last_run_at = _dt_now()
-        cfg.last_status = "ERROR"
-        cfg.last_error = str(e)
-        cfg.updated_at = _dt_now()
-        session.add(cfg)
-        session.commit()
-        raise
-
-
-def _sync_window(session, client: MSClient, project_ms_id: str, start_ms: int, end_ms: int) -> int:
-    page = 1
-    page_size = 100
-    saved = 0
-    max_pages = 200
-    while page <= max_pages:
-        data = client.fetch_scenario_reports(project_id=project_ms_id, start_time_ms=start_ms, end_time_ms=end_ms, page=page, page_size=page_size)
-        if data.get("code") != 100200:
-            raise RuntimeError(f"MS response error: {data}")
-        page_list = (data.get("data") or {}).get("list") or []
-        total = (data.get("data") or {}).get("total") or 0
-        for item in page_list:
-            _upsert_result(session, project_ms_id, item)
-            saved += 1
-        if page * page_size >= int(total):
-            break
-        page += 1
-    return saved
-
-
-def _upsert_result(session, project_ms_id: str, item: dict) -> None:
-    report_id = str(item.get("id"))
-    name = item.get("name") or ""
-    start_time_ms = int(item.get("startTime") or 0)
-    end_time_ms = int(item.get("endTime") or 0)
-    request_duration_ms = item.get("requestDuration")
-    status = item.get("status")
-    error_count = item.get("errorCount")
-    success_count = item.get("successCount")
-
-    rec = session.exec(select(ProbeResult).where(ProbeResult.report_id == report_id)).first()
-    if rec is None:
-        rec = ProbeResult(
-            project_ms_id=str(project_ms_id),
-            report_id=report_id,
-            name=name,
-            start_time=datetime.utcfromtimestamp(start_time_ms / 1000),
-            end_time=datetime.utcfromtimestamp(end_time_ms / 1000),
-            request_duration_ms=request_duration_ms,
-            status=status,
-            error_count=error_count,
-            success_count=success_count,
-            created_at=_dt_now(),
-        )
-    else:
-        rec.project_ms_id = str(project_ms_id)
-        rec.name = name
-        rec.start_time = datetime.utcfromtimestamp(start_time_ms / 1000)
-        rec.end_time = datetime.utcfromtimestamp(end_time_ms / 1000)
-        rec.request_duration_ms = request_duration_ms
-        rec.status = status
-        rec.error_count = error_count
-        rec.success_count = success_count
-    session.add(rec)
-    session.commit()
+        return run_sync_config(session, client, cfg, max_pages=200)
+    finally:
+        reload_sync_schedule()
+
+
+@router.post("/ingest")
+def ingest_results(
+    payload: ProbeIngestPayload,
+    __: str = Depends(require_admin),
+    session=Depends(get_session),
+):
+    """Accept reports pushed by MeterSphere (or a relay) instead of waiting for the next poll.
+
+    Polling keeps running as a reconciliation sweep; reports it later sees
+    unchanged are skipped by the upsert path.
+    """
+    reports = [item.model_dump() for item in payload.reports]
+    written = ingest_reports(session, payload.project_ms_id, reports)
+    notify_written(payload.project_ms_id, written)
+    return {"received": len(reports), "saved": written.saved}
 
 
-@router.get("/results", response_model=PaginatedProbeResults)
-def list_results(
+_RESULT_FIELDS = tuple(ProbeResultOut.model_fields)
+_RESULT_COLUMNS = [getattr(ProbeResult, name) for name in _RESULT_FIELDS]
+
+
+@router.get("/results", response_model=Union[PaginatedProbeResults, ColumnarProbeResults])
+async def list_results(
     project_ms_id: str = Query(...),
     status: Optional[str] = Query(None),
     is_valid: Optional[bool] = Query(None),
     current: int = Query(1, ge=1),
     pageSize: int = Query(10, ge=1, le=1000),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page; replaces current"),
+    include_total: bool = Query(True),
+    format: str = Query("rows", pattern="^(rows|columnar)$", description="columnar returns list as parallel arrays"),
+    delta: bool = Query(False, description="delta-encode integer columns (columnar only)"),
     _: str = Depends(get_current_user),
-    session=Depends(get_session),
+    session: AsyncSession = Depends(get_async_read_session),
 ):
-    stmt = select(ProbeResult).where(ProbeResult.project_ms_id == project_ms_id)
+    """Page through the hot table, newest first.
+
+    Archived months are not listed; archived_before tells where they start
+    and /results/export streams them. format=columnar returns list as
+    parallel arrays (ColumnarProbeResults) instead of row objects.
+    """
+    conditions = [ProbeResult.project_ms_id == project_ms_id]
     if status:
-        stmt = stmt.where(ProbeResult.status == status)
+        conditions.append(ProbeResult.status == status)
     if is_valid is not None:
-        stmt = stmt.where(ProbeResult.is_valid == is_valid)
-    total = len(session.exec(stmt).all())
-    stmt = stmt.order_by(ProbeResult.start_time.desc()).offset((current - 1) * pageSize).limit(pageSize)
-    rows = session.exec(stmt).all()
-    items = [ProbeResultOut.model_validate(r, from_attributes=True) for r in rows]
-    return {"list": items, "total": total, "pageSize": pageSize, "current": current}
+        conditions.append(ProbeResult.is_valid == is_valid)
+    total = None
+    if include_total:
+        total = (await session.exec(select(func.count()).select_from(ProbeResult).where(*conditions))).one()
+    # project only the output columns and serialize plain rows with orjson;
+    # building ORM objects and pydantic models dominated large pages
+    stmt = select(*_RESULT_COLUMNS).where(*conditions)
+    stmt = stmt.order_by(ProbeResult.start_time.desc(), ProbeResult.id.desc())
+    if cursor:
+        stmt = keyset_before(stmt, ProbeResult.start_time, ProbeResult.id, cursor)
+    else:
+        stmt = stmt.offset((current - 1) * pageSize)
+    rows = (await session.exec(stmt.limit(pageSize + 1))).all()
+    if format == "columnar":
+        items = to_columnar(_RESULT_FIELDS, rows[:pageSize], delta=delta)
+    else:
+        items = [dict(zip(_RESULT_FIELDS, row)) for row in rows[:pageSize]]
+    return ORJSONResponse({
+        "list": items,
+        "total": total,
+        "pageSize": pageSize,
+        "current": current,
+        "next_cursor": next_cursor(rows, pageSize),
+        "archived_before": await archived_before(session, project_ms_id),
+    })
+
+
+@router.get("/results/export")
+def export_results(
+    project_ms_id: str = Query(...),
+    start_time: Optional[datetime] = Query(None, description="defaults to 365 days before end_time"),
+    end_time: Optional[datetime] = Query(None, description="exclusive, defaults to now"),
+    status: Optional[str] = Query(None),
+    is_valid: Optional[bool] = Query(None, description="true exports the counted incidents only"),
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    gzip: bool = Query(False),
+    _: str = Depends(get_current_user),
+):
+    """Stream probe results (archived months included) as NDJSON or CSV.
+
+    Rows come from a server-side cursor and are written out as they are
+    read, so memory use does not grow with the size of the export.
+    """
+    end_time = end_time or _dt_now()
+    start_time = start_time or end_time - timedelta(days=365)
+    if start_time >= end_time:
+        raise HTTPException(status_code=400, detail="start_time must be before end_time")
+
+    body = probe_export.export_results(
+        project_ms_id, start_time, end_time, fmt=format, status=status, is_valid=is_valid, compress=gzip
+    )
+    filename = f"probe-results-{project_ms_id}-{start_time:%Y%m%d}-{end_time:%Y%m%d}.{format}"
+    media_type = "application/x-ndjson" if format == "ndjson" else "text/csv; charset=utf-8"
+    if gzip:
+        filename += ".gz"
+        media_type = "application/gzip"
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
+@router.post("/results/bulk-update")
+def bulk_update_results(
+    data: ProbeResultBulkUpdate,
+    __: str = Depends(get_current_user),
+    session=Depends(get_session),
+):
+    """Relabel many results with one UPDATE and one SLO recompute per affected period.
+
+    Only rows still in the hot table are changed; archived months are read-only.
+    """
+    changes = data.model_dump(include={"reason_label", "is_valid"}, exclude_unset=True)
+    if "is_valid" in changes and changes["is_valid"] is None:
+        del changes["is_valid"]  # not nullable
+    if not changes:
+        raise HTTPException(status_code=400, detail="Nothing to update: set reason_label and/or is_valid")
+    if not data.ids and not data.project_ms_id:
+        raise HTTPException(status_code=400, detail="Either ids or project_ms_id is required")
+
+    conditions = []
+    if data.ids:
+        conditions.append(ProbeResult.id.in_(data.ids))
+    if data.project_ms_id:
+        conditions.append(ProbeResult.project_ms_id == data.project_ms_id)
+    if data.start_time:
+        conditions.append(ProbeResult.start_time >= data.start_time)
+    if data.end_time:
+        conditions.append(ProbeResult.start_time < data.end_time)
+    if data.status:
+        conditions.append(ProbeResult.status == data.status)
+
+    # the month range each project is touched in, to know which periods to recompute
+    spans = session.exec(
+        select(ProbeResult.project_ms_id, func.min(ProbeResult.start_time), func.max(ProbeResult.start_time))
+        .where(*conditions)
+        .group_by(ProbeResult.project_ms_id)
+    ).all()
+    if not spans:
+        return {"updated": 0, "periods": []}
+
+    result = session.exec(
+        update(ProbeResult).where(*conditions).values(**changes).execution_options(synchronize_session=False)
+    )
+    session.commit()
+
+    periods = []
+    for project_ms_id, first, last in spans:
+        response_cache.bump_version(project_ms_id)
+        if "is_valid" not in changes:
+            # reason_label alone does not change availability
+            continue
+        month = first.year * 12 + first.month - 1
+        while month <= last.year * 12 + last.month - 1:
+            periods.append((project_ms_id, "monthly", f"{month // 12}-{month % 12 + 1:02d}"))
+            month += 1
+        periods.extend((project_ms_id, "yearly", str(year)) for year in range(first.year, last.year + 1))
+    for project_ms_id, period_type, period_value in periods:
+        enqueue_slo_refresh(project_ms_id, period_type, period_value)
+    # the UPDATE is committed and the recomputes queued; a failed rollup must not turn this into a 500
+    if "is_valid" in changes:
+        for project_ms_id, first, last in spans:
+            refresh_hourly_buckets_quietly(session, project_ms_id, first, last)
+
+    return {
+        "updated": result.rowcount,
+        "periods": [
+            {"project_ms_id": p, "period_type": t, "period_value": v} for p, t, v in periods
+        ],
+    }
 
 
 @router.patch("/results/{result_id}", response_model=ProbeResultOut)
@@ -292,6 +368,10 @@ def update_result_reason(
     session.add(rec)
     session.commit()
     session.refresh(rec)
-    return ProbeResultOut.model_validate(rec, from_attributes=True)
+    out = ProbeResultOut.model_validate(rec, from_attributes=True)
+    response_cache.bump_version(out.project_ms_id)
+    if is_valid is not None:
+        refresh_hourly_buckets_quietly(session, out.project_ms_id, out.start_time, out.start_time)
+    return out
 
 
@@ -3,19 +3,21 @@ SLO分析API路由
 """
 from datetime import datetime, timezone
 from typing import Optional, List
-from fastapi import APIRouter, Depends, HTTPException, Query, Body
+from fastapi import APIRouter, Depends, HTTPException, Query, Body, Request, Response
 from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from sqlmodel import Session, select, func, and_
+from sqlmodel import Session, select, and_
 import json
 
-from db import get_session
+from db import get_read_session, get_session
 from deps import get_current_user
 from models import (
-    User, Project, SLORecord, SLOConfig, ProbeResult
+    User, Project, SLORecord, SLOConfig
 )
-from services.slo_calculator import calculate_slo_for_period
+from services import response_cache
 from services.ai_service import stream_ai_analysis
+from services.probe_archive import load_results
+from services.slo_refresh import record_age_seconds, refresh_if_stale
 
 
 class ChatRequest(BaseModel):
@@ -27,12 +29,26 @@ router = APIRouter()
 
 @router.get("/data")
 def get_slo_analysis_data(
+    request: Request,
+    response: Response,
     project_ms_id: str = Query(..., description="项目ID"),
     _: User = Depends(get_current_user),
-    session: Session = Depends(get_session)
+    session: Session = Depends(get_read_session)
 ):
     """
-    获取SLO分析数据
+    获取SLO分析数据（带缓存，支持If-None-Match返回304）
+    """
+    entry = response_cache.lookup("analysis", project_ms_id)
+    if entry is None:
+        version = response_cache.current_version(project_ms_id)
+        payload = build_analysis_data(session, project_ms_id)
+        entry = response_cache.store("analysis", project_ms_id, (), version, payload)
+    return response_cache.respond(request, response, entry)
+
+
+def build_analysis_data(session: Session, project_ms_id: str) -> dict:
+    """
+    构建SLO分析数据
     包括：SLO配置、当前SLO值、有效拨测数量
     """
     # 验证项目是否存在
@@ -48,7 +64,7 @@ def get_slo_analysis_data(
     current_month = f"{now.year}-{now.month:02d}"
     current_year = str(now.year)
     
-    # 获取或计算当前月的SLO
+    # 获取当前月的SLO（只读已存储的记录，不在请求中计算）
     monthly_record = session.exec(
         select(SLORecord).where(
             SLORecord.project_ms_id == project.ms_id,
@@ -57,12 +73,7 @@ def get_slo_analysis_data(
         )
     ).first()
     
-    if not monthly_record:
-        monthly_record = calculate_slo_for_period(
-            session, project.ms_id, "monthly", current_month
-        )
-    
-    # 获取或计算当前年的SLO
+    # 获取当前年的SLO
     yearly_record = session.exec(
         select(SLORecord).where(
             SLORecord.project_ms_id == project.ms_id,
@@ -71,11 +82,6 @@ def get_slo_analysis_data(
         )
     ).first()
     
-    if not yearly_record:
-        yearly_record = calculate_slo_for_period(
-            session, project.ms_id, "yearly", current_year
-        )
-    
     # 获取SLO配置
     monthly_config = session.exec(
         select(SLOConfig).where(
@@ -91,29 +97,23 @@ def get_slo_analysis_data(
         )
     ).first()
     
+    # 记录缺失或过期时后台刷新，本次直接返回已有数据
+    monthly_stale = monthly_config is not None and refresh_if_stale(
+        project.ms_id, "monthly", current_month, monthly_record
+    )
+    yearly_stale = yearly_config is not None and refresh_if_stale(
+        project.ms_id, "yearly", current_year, yearly_record
+    )
+    
     # 获取当年有效拨测数量（is_valid=1，start_time范围是当年）
     # 使用UTC时间创建日期对象（数据库存储的是UTC时间）
     year_start = datetime(now.year, 1, 1)
     year_end = datetime(now.year + 1, 1, 1)
     
-    valid_probe_count = session.exec(
-        select(func.count(ProbeResult.id)).where(
-            ProbeResult.project_ms_id == project_ms_id,
-            ProbeResult.is_valid == True,  # noqa: E712
-            ProbeResult.start_time >= year_start,
-            ProbeResult.start_time < year_end
-        )
-    ).one()
-    
-    # 获取有效拨测列表（只获取name和reason_label）
-    valid_probes = session.exec(
-        select(ProbeResult).where(
-            ProbeResult.project_ms_id == project_ms_id,
-            ProbeResult.is_valid == True,  # noqa: E712
-            ProbeResult.start_time >= year_start,
-            ProbeResult.start_time < year_end
-        ).order_by(ProbeResult.start_time.desc())
-    ).all()
+    # 热表与归档透明合并（按时间倒序）
+    valid_probes = load_results(session, project_ms_id, year_start, year_end, is_valid=True)
+    valid_probes.reverse()
+    valid_probe_count = len(valid_probes)
     
     # 构建响应
     return {
@@ -137,12 +137,18 @@ def get_slo_analysis_data(
                 "achievement_rate": monthly_record.achievement_rate if monthly_record else 1.0,
                 "error_budget_consumption": monthly_record.error_budget_consumption if monthly_record else 0.0,
                 "total_downtime_seconds": monthly_record.total_downtime_seconds if monthly_record else 0.0,
+                "calculated_at": monthly_record.calculated_at.isoformat() if monthly_record.calculated_at else None,
+                "age_seconds": record_age_seconds(monthly_record),
+                "stale": monthly_stale,
             } if monthly_record else None,
             "yearly": {
                 "period_value": current_year,
                 "achievement_rate": yearly_record.achievement_rate if yearly_record else 1.0,
                 "error_budget_consumption": yearly_record.error_budget_consumption if yearly_record else 0.0,
                 "total_downtime_seconds": yearly_record.total_downtime_seconds if yearly_record else 0.0,
+                "calculated_at": yearly_record.calculated_at.isoformat() if yearly_record.calculated_at else None,
+                "age_seconds": record_age_seconds(yearly_record),
+                "stale": yearly_stale,
             } if yearly_record else None,
         },
         "valid_probe_count": valid_probe_count,
@@ -164,7 +170,7 @@ def chat_analysis(
     流式调用AI模型进行SLO分析
     """
     # 获取SLO分析数据
-    analysis_data = get_slo_analysis_data(project_ms_id, _, session)
+    analysis_data = build_analysis_data(session, project_ms_id)
     
     # 构建prompt
     prompt = build_analysis_prompt(analysis_data, request.message)
@@ -1,23 +1,39 @@
 """
 SLO大屏API路由
 """
+import asyncio
+import os
 from datetime import datetime, timedelta
 from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
 from sqlmodel import Session, select, func, and_, or_
+from sqlmodel.ext.asyncio.session import AsyncSession
 
-from db import get_session
+from columnar import records_to_columnar, to_columnar
+from fastapi.concurrency import run_in_threadpool
+
+from db import get_async_read_session, get_read_session, read_engine
 from deps import get_current_user
 from models import (
     User, Project, SLORecord, SLOConfig, ProbeResult, 
-    ProbeConfig
+    ProbeConfig, ProbeHourlyBucket
 )
+from pagination import decode_cursor, keyset_before, next_cursor
 from schemas import ProjectOut
-from services.slo_calculator import calculate_slo_for_period
+from services import response_cache, slo_events
+from services.probe_archive import archived_before, load_results
+from services.probe_buckets import HOUR, downtime_for_range, floor_hour
+from services.slo_refresh import enqueue_slo_refresh, record_age_seconds, refresh_if_stale
 
 
 router = APIRouter()
 
+# 推送流无消息时发送心跳的间隔（秒），需小于反向代理的读超时
+SLO_STREAM_HEARTBEAT_SECONDS = float(os.getenv("SLO_STREAM_HEARTBEAT_SECONDS", "15"))
+# 连接断开后客户端重连前等待的时间（毫秒）
+SLO_STREAM_RETRY_MS = int(os.getenv("SLO_STREAM_RETRY_MS", "1000"))
+
 
 def get_global_status(monthly_record: Optional[SLORecord], yearly_record: Optional[SLORecord], 
                       monthly_config: Optional[SLOConfig], yearly_config: Optional[SLOConfig]) -> str:
@@ -81,18 +97,29 @@ def get_global_status(monthly_record: Optional[SLORecord], yearly_record: Option
 
 
 @router.get("/dashboard")
-def get_slo_dashboard(
+async def get_slo_dashboard(
+    request: Request,
+    response: Response,
     project_ms_id: str = Query(..., description="项目ID"),
     _: User = Depends(get_current_user),
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_async_read_session)
 ):
     """
-    获取SLO大屏数据
+    获取SLO大屏数据（带缓存，支持If-None-Match返回304）
     """
+    entry = response_cache.lookup("dashboard", project_ms_id)
+    if entry is None:
+        version = response_cache.current_version(project_ms_id)
+        payload = await _build_dashboard(session, project_ms_id)
+        entry = response_cache.store("dashboard", project_ms_id, (), version, payload)
+    return response_cache.respond(request, response, entry)
+
+
+async def _build_dashboard(session: AsyncSession, project_ms_id: str) -> dict:
     # 验证项目是否存在（通过ms_id查找）
-    project = session.exec(
+    project = (await session.exec(
         select(Project).where(Project.ms_id == project_ms_id)
-    ).first()
+    )).first()
     
     if not project:
         raise HTTPException(status_code=404, detail="项目不存在")
@@ -102,50 +129,46 @@ def get_slo_dashboard(
     current_month = f"{now.year}-{now.month:02d}"
     current_year = str(now.year)
     
-    # 计算或获取当前月的SLO
-    monthly_record = session.exec(
+    # 获取当前月的SLO（只读已存储的记录，不在请求中计算）
+    monthly_record = (await session.exec(
         select(SLORecord).where(
             SLORecord.project_ms_id == project.ms_id,
             SLORecord.period_type == "monthly",
             SLORecord.period_value == current_month
         )
-    ).first()
+    )).first()
     
-    # 如果不存在，尝试计算
-    if not monthly_record:
-        monthly_record = calculate_slo_for_period(
-            session, project.ms_id, "monthly", current_month
-        )
-    
-    # 计算或获取当前年的SLO
-    yearly_record = session.exec(
+    # 获取当前年的SLO
+    yearly_record = (await session.exec(
         select(SLORecord).where(
             SLORecord.project_ms_id == project.ms_id,
             SLORecord.period_type == "yearly",
             SLORecord.period_value == current_year
         )
-    ).first()
-    
-    # 如果不存在，尝试计算
-    if not yearly_record:
-        yearly_record = calculate_slo_for_period(
-            session, project.ms_id, "yearly", current_year
-        )
+    )).first()
     
     # 获取SLO配置
-    monthly_config = session.exec(
+    monthly_config = (await session.exec(
         select(SLOConfig).where(
             SLOConfig.project_ms_id == project_ms_id,
             SLOConfig.period_type == "monthly"
         )
-    ).first()
+    )).first()
     
-    yearly_config = session.exec(
+    yearly_config = (await session.exec(
         select(SLOConfig).where(
             SLOConfig.project_ms_id == project_ms_id,
             SLOConfig.period_type == "yearly"
         )
-    ).first()
+    )).first()
+    
+    # 记录缺失或过期时后台刷新，本次直接返回已有数据
+    monthly_stale = monthly_config is not None and refresh_if_stale(
+        project.ms_id, "monthly", current_month, monthly_record
+    )
+    yearly_stale = yearly_config is not None and refresh_if_stale(
+        project.ms_id, "yearly", current_year, yearly_record
+    )
     
     # 计算全局状态
     global_status = get_global_status(
@@ -197,6 +220,9 @@ def get_slo_dashboard(
             "remaining_time": monthly_remaining,
             "total_downtime_seconds": monthly_record.total_downtime_seconds if monthly_record else 0.0,
             "max_downtime_minutes": monthly_config.max_downtime_minutes if monthly_config else None,
+            "calculated_at": monthly_record.calculated_at.isoformat() if monthly_record and monthly_record.calculated_at else None,
+            "age_seconds": record_age_seconds(monthly_record),
+            "stale": monthly_stale,
         },
         "yearly": {
             "period_value": current_year,
@@ -207,88 +233,197 @@ def get_slo_dashboard(
             "remaining_time": yearly_remaining,
             "total_downtime_seconds": yearly_record.total_downtime_seconds if yearly_record else 0.0,
             "max_downtime_minutes": yearly_config.max_downtime_minutes if yearly_config else None,
+            "calculated_at": yearly_record.calculated_at.isoformat() if yearly_record and yearly_record.calculated_at else None,
+            "age_seconds": record_age_seconds(yearly_record),
+            "stale": yearly_stale,
         },
     }
     
     return result
 
 
+def _period_summary(record: Optional[SLORecord], config: Optional[SLOConfig], period_value: str) -> dict:
+    consumption = record.error_budget_consumption if record else 0.0
+    return {
+        "period_value": period_value,
+        "target": config.target if config else None,
+        "achievement_rate": record.achievement_rate if record else 1.0,
+        "error_budget_consumption": consumption,
+        "remaining_budget": 1.0 - consumption,
+        "total_downtime_seconds": record.total_downtime_seconds if record else 0.0,
+    }
+
+
+@router.get("/overview")
+def get_slo_overview(
+    project_ms_ids: Optional[str] = Query(None, description="项目ID列表，逗号分隔；为空表示全部项目"),
+    _: User = Depends(get_current_user),
+    session: Session = Depends(get_read_session)
+):
+    """
+    多项目SLO总览（大屏墙）
+    项目、SLO记录、SLO配置各一次查询，不在请求中触发计算
+    """
+    now = datetime.utcnow()
+    current_month = f"{now.year}-{now.month:02d}"
+    current_year = str(now.year)
+    
+    project_query = select(Project)
+    if project_ms_ids:
+        ids = [pid.strip() for pid in project_ms_ids.split(",") if pid.strip()]
+        project_query = project_query.where(Project.ms_id.in_(ids))
+    projects = session.exec(project_query.order_by(Project.ms_name)).all()
+    if not projects:
+        return {"last_updated": now.isoformat(), "projects": []}
+    ms_ids = [p.ms_id for p in projects]
+    
+    records = session.exec(
+        select(SLORecord).where(
+            SLORecord.project_ms_id.in_(ms_ids),
+            or_(
+                and_(SLORecord.period_type == "monthly", SLORecord.period_value == current_month),
+                and_(SLORecord.period_type == "yearly", SLORecord.period_value == current_year),
+            )
+        )
+    ).all()
+    configs = session.exec(
+        select(SLOConfig).where(SLOConfig.project_ms_id.in_(ms_ids))
+    ).all()
+    
+    records_by_key = {(r.project_ms_id, r.period_type): r for r in records}
+    configs_by_key = {(c.project_ms_id, c.period_type): c for c in configs}
+    
+    items = []
+    for project in projects:
+        monthly_record = records_by_key.get((project.ms_id, "monthly"))
+        yearly_record = records_by_key.get((project.ms_id, "yearly"))
+        monthly_config = configs_by_key.get((project.ms_id, "monthly"))
+        yearly_config = configs_by_key.get((project.ms_id, "yearly"))
+        items.append({
+            "project": {
+                "ms_id": project.ms_id,
+                "ms_name": project.ms_name,
+            },
+            "global_status": get_global_status(
+                monthly_record, yearly_record, monthly_config, yearly_config
+            ),
+            "monthly": _period_summary(monthly_record, monthly_config, current_month),
+            "yearly": _period_summary(yearly_record, yearly_config, current_year),
+        })
+    
+    return {"last_updated": now.isoformat(), "projects": items}
+
+
 @router.get("/trend")
-def get_slo_trend(
+async def get_slo_trend(
+    request: Request,
+    response: Response,
     project_ms_id: str = Query(..., description="项目ID"),
     period_type: str = Query("monthly", description="周期类型：monthly"),
     months: int = Query(12, ge=1, le=24, description="查询月份数"),
+    format: str = Query("rows", pattern="^(rows|columnar)$", description="columnar：trends按列返回"),
+    delta: bool = Query(False, description="对整数列做差分编码（仅columnar）"),
     _: User = Depends(get_current_user),
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_async_read_session)
 ):
     """
-    获取SLO趋势数据（仅支持月度）
+    获取SLO趋势数据（仅支持月度，带缓存，支持If-None-Match返回304）
     """
     if period_type != "monthly":
         raise HTTPException(status_code=400, detail="目前只支持月度趋势查询")
     
+    params = (months, format, delta)
+    entry = response_cache.lookup("trend", project_ms_id, params)
+    if entry is None:
+        version = response_cache.current_version(project_ms_id)
+        payload = await _build_trend(session, project_ms_id, months)
+        if format == "columnar":
+            payload["trends"] = records_to_columnar(payload["trends"], _TREND_FIELDS, delta=delta)
+        entry = response_cache.store("trend", project_ms_id, params, version, payload)
+    return response_cache.respond(request, response, entry)
+
+
+_TREND_FIELDS = ("period", "achievement_rate", "target", "error_budget_consumption", "pending")
+
+
+def _recent_months(now: datetime, months: int) -> List[str]:
+    """最近N个自然月（含当月），按时间升序，如 ["2025-10", "2025-11"]"""
+    index = now.year * 12 + now.month - 1
+    return [
+        f"{i // 12}-{i % 12 + 1:02d}"
+        for i in range(index - months + 1, index + 1)
+    ]
+
+
+async def _build_trend(session: AsyncSession, project_ms_id: str, months: int) -> dict:
     # 获取最近N个月的数据（使用UTC时间）
-    now = datetime.utcnow()
-    trends = []
+    month_values = _recent_months(datetime.utcnow(), months)
     
-    for i in range(months - 1, -1, -1):
-        # 计算月份
-        target_date = now - timedelta(days=30 * i)
-        month_value = f"{target_date.year}-{target_date.month:02d}"
-        
-        # 获取或计算SLO记录
-        record = session.exec(
-            select(SLORecord).where(
-                SLORecord.project_ms_id == project_ms_id,
-                SLORecord.period_type == "monthly",
-                SLORecord.period_value == month_value
-            )
-        ).first()
-        
-        if not record:
-            record = calculate_slo_for_period(
-                session, project_ms_id, "monthly", month_value
-            )
-        
-        # 获取配置
-        config = session.exec(
-            select(SLOConfig).where(
-                SLOConfig.project_ms_id == project_ms_id,
-                SLOConfig.period_type == "monthly"
-            )
-        ).first()
+    # 一次查询所有月份的记录
+    records = (await session.exec(
+        select(SLORecord).where(
+            SLORecord.project_ms_id == project_ms_id,
+            SLORecord.period_type == "monthly",
+            SLORecord.period_value.in_(month_values)
+        )
+    )).all()
+    records_by_month = {r.period_value: r for r in records}
+    
+    # 获取配置（所有月份共用）
+    config = (await session.exec(
+        select(SLOConfig).where(
+            SLOConfig.project_ms_id == project_ms_id,
+            SLOConfig.period_type == "monthly"
+        )
+    )).first()
+    
+    trends = []
+    for month_value in month_values:
+        record = records_by_month.get(month_value)
+        # 缺失的月份交给后台计算，本次先返回默认值
+        if not record and config:
+            enqueue_slo_refresh(project_ms_id, "monthly", month_value)
         
-        if record:
-            trends.append({
-                "period": month_value,
-                "achievement_rate": record.achievement_rate,
-                "target": config.target if config else None,
-                "error_budget_consumption": record.error_budget_consumption,
-            })
-        else:
-            # 如果没有数据，使用默认值
-            trends.append({
-                "period": month_value,
-                "achievement_rate": 1.0,
-                "target": config.target if config else None,
-                "error_budget_consumption": 0.0,
-            })
+        trends.append({
+            "period": month_value,
+            "achievement_rate": record.achievement_rate if record else 1.0,
+            "target": config.target if config else None,
+            "error_budget_consumption": record.error_budget_consumption if record else 0.0,
+            "pending": record is None and config is not None,
+        })
     
     return {"trends": trends}
 
 
+_EVENT_FIELDS = ("id", "name", "start_time", "reason_label", "status")
+
+
+def _load_archived_events(project_ms_id: str, start_time: datetime, end_time: datetime) -> List[ProbeResult]:
+    """归档范围内的失败记录（含热表中尚未删除的重复行已去重），按 (start_time, id) 倒序"""
+    with Session(read_engine) as session:
+        results = load_results(session, project_ms_id, start_time, end_time, is_valid=True)
+    results.sort(key=lambda r: (r.start_time, r.id or 0), reverse=True)
+    return results
+
+
 @router.get("/events")
-def get_slo_events(
+async def get_slo_events(
     project_ms_id: str = Query(..., description="项目ID"),
     start_time: Optional[datetime] = Query(None, description="开始时间"),
     end_time: Optional[datetime] = Query(None, description="结束时间"),
     current: int = Query(1, ge=1, description="当前页"),
     pageSize: int = Query(20, ge=1, le=100, description="每页大小"),
+    cursor: Optional[str] = Query(None, description="上一页返回的next_cursor，传入后忽略current"),
+    include_total: bool = Query(True, description="是否返回总数"),
+    format: str = Query("rows", pattern="^(rows|columnar)$", description="columnar：list按列返回"),
+    delta: bool = Query(False, description="对整数列做差分编码（仅columnar）"),
     _: User = Depends(get_current_user),
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_async_read_session)
 ):
     """
     获取SLO异常事件列表（拨测失败记录）
+
+    时间范围早于归档截止时间的部分透明读取归档（load_results），其余部分直接查询热表
     """
     # 默认查询最近7天（使用UTC时间）
     if not end_time:
@@ -296,43 +431,241 @@ def get_slo_events(
     if not start_time:
         start_time = end_time - timedelta(days=7)
     
+    # 热表完整覆盖 [cutoff, ...)，之前的部分走归档
+    cutoff = await archived_before(session, project_ms_id)
+    archived_end = None
+    if cutoff is not None and start_time < cutoff:
+        # end_time 为闭区间
+        archived_end = min(cutoff, end_time + timedelta(microseconds=1))
+    
     # 查询失败记录（is_valid=1表示失败）
-    query = select(ProbeResult).where(
+    conditions = [
         ProbeResult.project_ms_id == project_ms_id,
         ProbeResult.is_valid == True,  # noqa: E712
-        ProbeResult.start_time >= start_time,
-        ProbeResult.start_time <= end_time
-    ).order_by(ProbeResult.start_time.desc())
+        ProbeResult.start_time >= (max(start_time, cutoff) if archived_end is not None else start_time),
+        ProbeResult.start_time <= end_time,
+    ]
+    
+    archived: List[ProbeResult] = []
+    if archived_end is not None:
+        archived = await run_in_threadpool(_load_archived_events, project_ms_id, start_time, archived_end)
     
     # 计算总数
-    count_query = select(func.count()).select_from(
-        select(ProbeResult).where(
-            ProbeResult.project_ms_id == project_ms_id,
-            ProbeResult.is_valid == True,  # noqa: E712
-            ProbeResult.start_time >= start_time,
-            ProbeResult.start_time <= end_time
-        ).subquery()
+    total = None
+    hot_total = None
+    if include_total or (archived and not cursor):
+        hot_total = (await session.exec(
+            select(func.count()).select_from(ProbeResult).where(*conditions)
+        )).one()
+        if include_total:
+            total = hot_total + len(archived)
+    
+    # 分页查询：有cursor时按(start_time, id)做keyset分页，深分页与首页开销相同
+    query = select(ProbeResult).where(*conditions).order_by(
+        ProbeResult.start_time.desc(), ProbeResult.id.desc()
     )
-    total = session.exec(count_query).one()
-    
-    # 分页查询
-    offset = (current - 1) * pageSize
-    results = session.exec(query.offset(offset).limit(pageSize)).all()
-    
-    events = []
-    for result in results:
-        events.append({
-            "id": result.id,
-            "name": result.name,
-            "start_time": result.start_time.isoformat(),
-            "reason_label": result.reason_label,
-            "status": result.status,
-        })
+    if cursor:
+        query = keyset_before(query, ProbeResult.start_time, ProbeResult.id, cursor)
+    else:
+        query = query.offset((current - 1) * pageSize)
+    results = list((await session.exec(query.limit(pageSize + 1))).all())
     
+    # 归档部分都早于热表部分，热表不足一页时接着取归档
+    if archived and len(results) <= pageSize:
+        if cursor:
+            before = decode_cursor(cursor)
+            archived = [r for r in archived if (r.start_time, r.id) < before]
+        else:
+            archived = archived[max(0, (current - 1) * pageSize - hot_total):]
+        results.extend(archived[:pageSize + 1 - len(results)])
+    
+    if format == "columnar":
+        events = to_columnar(
+            _EVENT_FIELDS,
+            ([getattr(result, name) for name in _EVENT_FIELDS] for result in results[:pageSize]),
+            delta=delta,
+        )
+    else:
+        events = []
+        for result in results[:pageSize]:
+            events.append({
+                "id": result.id,
+                "name": result.name,
+                "start_time": result.start_time.isoformat(),
+                "reason_label": result.reason_label,
+                "status": result.status,
+            })
+
     return {
         "list": events,
         "total": total,
         "current": current,
         "pageSize": pageSize,
+        "next_cursor": next_cursor(results, pageSize),
+    }
+
+
+# 热力图单次查询的最大格子数：按小时约一年，按天约五年
+_HEATMAP_MAX_CELLS = 366 * 24
+
+
+@router.get("/heatmap")
+async def get_slo_heatmap(
+    project_ms_id: str = Query(..., description="项目ID"),
+    granularity: str = Query("hour", pattern="^(hour|day)$", description="粒度：hour 或 day"),
+    start_time: Optional[datetime] = Query(None, description="开始时间，默认按小时为最近30天、按天为最近365天"),
+    end_time: Optional[datetime] = Query(None, description="结束时间（不含），默认当前时间"),
+    _: User = Depends(get_current_user),
+    session: AsyncSession = Depends(get_async_read_session)
+):
+    """
+    获取可用性热力图（按列返回）
+
+    从小时汇总表读取，第i个格子的起点为 start + i * step_seconds；
+    availability = 1 - 中断时间 / 格子时长，没有拨测的格子为null
+    """
+    step = HOUR if granularity == "hour" else timedelta(days=1)
+    
+    def cell_start(dt: datetime) -> datetime:
+        dt = floor_hour(dt)
+        return dt if granularity == "hour" else dt.replace(hour=0)
+    
+    # 结束时间向上对齐到格子边界，包含当前未结束的小时/天
+    end_time = end_time or datetime.utcnow()
+    end_cell = cell_start(end_time)
+    end_time = end_cell if end_cell == end_time else end_cell + step
+    if not start_time:
+        start_time = end_time - (timedelta(days=30) if granularity == "hour" else timedelta(days=365))
+    start_time = cell_start(start_time)
+    cells = int((end_time - start_time) / step)
+    if cells <= 0:
+        raise HTTPException(status_code=400, detail="开始时间必须早于结束时间")
+    max_cells = _HEATMAP_MAX_CELLS if granularity == "hour" else _HEATMAP_MAX_CELLS // 24 * 5
+    if cells > max_cells:
+        raise HTTPException(status_code=400, detail=f"时间范围过大，最多{max_cells}个格子")
+    
+    rows = (await session.exec(
+        select(
+            ProbeHourlyBucket.bucket_start,
+            ProbeHourlyBucket.probe_count,
+            ProbeHourlyBucket.failed_count,
+            ProbeHourlyBucket.downtime_seconds,
+        ).where(
+            ProbeHourlyBucket.project_ms_id == project_ms_id,
+            ProbeHourlyBucket.bucket_start >= start_time,
+            ProbeHourlyBucket.bucket_start < end_time,
+        )
+    )).all()
+    
+    probe_count = [0] * cells
+    failed_count = [0] * cells
+    downtime = [0.0] * cells
+    step_seconds = step.total_seconds()
+    for bucket_start, probes, failures, downtime_seconds in rows:
+        i = int((bucket_start - start_time).total_seconds() // step_seconds)
+        probe_count[i] += probes
+        failed_count[i] += failures
+        downtime[i] += downtime_seconds
+    
+    availability = [
+        round(max(0.0, 1.0 - downtime[i] / step_seconds), 6) if probe_count[i] else None
+        for i in range(cells)
+    ]
+    return {
+        "project_ms_id": project_ms_id,
+        "granularity": granularity,
+        "start": start_time.isoformat(),
+        "step_seconds": int(step_seconds),
+        "availability": availability,
+        "probe_count": probe_count,
+        "failed_count": failed_count,
+        "downtime_seconds": [round(d, 3) for d in downtime],
+    }
+
+
+@router.get("/range")
+def get_slo_range(
+    project_ms_id: str = Query(..., description="项目ID"),
+    start: datetime = Query(..., description="开始时间（UTC）"),
+    end: datetime = Query(..., description="结束时间（UTC，不含）"),
+    target: Optional[float] = Query(None, gt=0, lt=1, description="SLO目标，默认使用项目月度SLO配置"),
+    _: User = Depends(get_current_user),
+    session: Session = Depends(get_read_session)
+):
+    """
+    获取任意时间段（如季度、发布窗口、最近90天）的SLO
+
+    整点小时部分累加小时汇总，只在首尾不足一小时的部分读取拨测明细；
+    与周期SLO相同，中断只计算到当前时间，总时长使用完整的时间段
+    """
+    if start >= end:
+        raise HTTPException(status_code=400, detail="开始时间必须早于结束时间")
+    if target is None:
+        config = session.exec(
+            select(SLOConfig).where(
+                SLOConfig.project_ms_id == project_ms_id,
+                SLOConfig.period_type == "monthly"
+            )
+        ).first()
+        target = config.target if config else None
+    
+    total_downtime_seconds = downtime_for_range(session, project_ms_id, start, min(end, datetime.utcnow()))
+    total_seconds = (end - start).total_seconds()
+    achievement_rate = max(total_seconds - total_downtime_seconds, 0.0) / total_seconds
+    
+    error_budget_seconds = None
+    error_budget_consumption = None
+    if target is not None:
+        error_budget_seconds = total_seconds * (1 - target)
+        # 与周期SLO计算一致：目标为100%时没有误差预算，消耗率记为0
+        if error_budget_seconds > 0:
+            error_budget_consumption = min(1.0, max(0.0, total_downtime_seconds / error_budget_seconds))
+        else:
+            error_budget_consumption = 0.0
+    
+    return {
+        "project_ms_id": project_ms_id,
+        "start": start.isoformat(),
+        "end": end.isoformat(),
+        "target": target,
+        "total_seconds": total_seconds,
+        "total_downtime_seconds": total_downtime_seconds,
+        "achievement_rate": achievement_rate,
+        "error_budget_seconds": error_budget_seconds,
+        "error_budget_consumption": error_budget_consumption,
+        "remaining_budget": 1.0 - error_budget_consumption if error_budget_consumption is not None else None,
     }
 
+
+@router.get("/stream")
+async def stream_slo_changes(
+    request: Request,
+    project_ms_id: Optional[List[str]] = Query(None, description="项目ID，可传多个；不传则订阅全部项目"),
+    _: User = Depends(get_current_user),
+):
+    """
+    SLO变更推送（Server-Sent Events）
+
+    SLO记录重新计算后推送 slo 消息（达成率、误差预算、燃烧率），新拨测结果写入后推送
+    events 消息；客户端收到后更新对应数据，无需轮询 /dashboard
+    """
+    async def _events():
+        sub = slo_events.subscribe(project_ms_id)
+        try:
+            yield f"retry: {SLO_STREAM_RETRY_MS}\n\n"
+            while True:
+                try:
+                    message = await asyncio.wait_for(sub.queue.get(), timeout=SLO_STREAM_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        break
+                    message = ": keepalive\n\n"
+                yield message
+        finally:
+            slo_events.unsubscribe(sub)
+
+    return StreamingResponse(
+        _events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -7,6 +7,7 @@ from db import get_session
 from deps import get_current_user
 from models import SLOConfig, User
 from schemas import SLOConfigCreate, SLOConfigOut, SLOConfigUpdate
+from services import response_cache
 
 
 router = APIRouter()
@@ -93,6 +94,7 @@ def create_slo_config(data: SLOConfigCreate, _: User = Depends(get_current_user)
     session.add(config)
     session.commit()
     session.refresh(config)
+    response_cache.bump_version(config.project_ms_id)
     return SLOConfigOut(**config.model_dump())  # type: ignore[arg-type]
 
 
@@ -119,6 +121,7 @@ def update_slo_config(
     session.add(config)
     session.commit()
     session.refresh(config)
+    response_cache.bump_version(config.project_ms_id)
     return SLOConfigOut(**config.model_dump())  # type: ignore[arg-type]
 
 
@@ -130,6 +133,7 @@ def delete_slo_config(config_id: int, _: User = Depends(get_current_user), sessi
         raise HTTPException(status_code=404, detail="SLO配置不存在")
     session.delete(config)
     session.commit()
+    response_cache.bump_version(config.project_ms_id)
     return {"ok": True}
 
 
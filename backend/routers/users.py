@@ -3,7 +3,7 @@ from fastapi import APIRouter, Depends, HTTPException
 from sqlmodel import select
 
 from db import get_session
-from deps import require_admin
+from deps import invalidate_user_cache, require_admin
 from models import User
 from schemas import UserCreate, UserOut, UserUpdate
 from security import get_password_hash
@@ -48,6 +48,7 @@ def update_user(user_id: int, data: UserUpdate, _: User = Depends(require_admin)
     session.add(user)
     session.commit()
     session.refresh(user)
+    invalidate_user_cache(user_id)
     return UserOut(**user.model_dump())  # type: ignore[arg-type]
 
 
@@ -58,6 +59,7 @@ def delete_user(user_id: int, _: User = Depends(require_admin), session=Depends(
         raise HTTPException(status_code=404, detail="User not found")
     session.delete(user)
     session.commit()
+    invalidate_user_cache(user_id)
     return {"ok": True}
 
 
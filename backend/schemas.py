@@ -1,6 +1,6 @@
 from datetime import datetime
-from typing import Optional, List
-from pydantic import BaseModel, EmailStr
+from typing import Any, Dict, Optional, List
+from pydantic import BaseModel, ConfigDict, EmailStr, Field
 
 
 class Token(BaseModel):
@@ -154,9 +154,65 @@ class ProbeResultOut(BaseModel):
 
 class PaginatedProbeResults(BaseModel):
     list: List[ProbeResultOut]
-    total: int
+    # None when requested with include_total=false
+    total: Optional[int] = None
     pageSize: int
     current: int
+    next_cursor: Optional[str] = None
+    # the list covers the hot table only; results before this time are archived
+    # and readable through /probe/results/export (None when nothing is archived)
+    archived_before: Optional[datetime] = None
+
+
+class ColumnarRows(BaseModel):
+    # rows as parallel arrays keyed by field name (see columnar.to_columnar);
+    # datetimes are epoch milliseconds, fields listed in delta hold the first
+    # value followed by differences to the previous one
+    length: int
+    columns: Dict[str, List[Any]]
+    delta: List[str] = []
+
+
+class ColumnarProbeResults(BaseModel):
+    # /probe/results?format=columnar
+    list: ColumnarRows
+    total: Optional[int] = None
+    pageSize: int
+    current: int
+    next_cursor: Optional[str] = None
+    archived_before: Optional[datetime] = None
+
+
+class ProbeResultBulkUpdate(BaseModel):
+    # rows to change: an id list, a filter (project_ms_id plus optional time
+    # range / status), or both combined
+    ids: Optional[List[int]] = Field(default=None, max_length=10000)
+    project_ms_id: Optional[str] = None
+    start_time: Optional[datetime] = None
+    end_time: Optional[datetime] = None
+    status: Optional[str] = None
+    # changes; only fields present in the request are applied, so
+    # reason_label can be cleared with an explicit null
+    reason_label: Optional[str] = None
+    is_valid: Optional[bool] = None
+
+
+class ProbeIngestReport(BaseModel):
+    # one item of MeterSphere's /api/report/scenario/page list; only the fields
+    # the upsert relies on are checked, the rest are kept as sent
+    model_config = ConfigDict(extra="allow", coerce_numbers_to_str=True)
+
+    id: str
+    name: Optional[str] = None
+    # epoch milliseconds
+    startTime: int
+    endTime: int
+    status: Optional[str] = None
+
+
+class ProbeIngestPayload(BaseModel):
+    project_ms_id: str
+    reports: List[ProbeIngestReport]
 
 
 class SLOConfigBase(BaseModel):
@@ -0,0 +1,122 @@
+"""
+登录保护
+bcrypt校验放在独立的小线程池中执行，排队已满时直接拒绝，避免登录高峰占满接口线程；
+同一用户名连续失败过多时暂时拒绝登录；配置的服务账号校验成功的结果短暂缓存，频繁登录时不再重复计算哈希
+"""
+import asyncio
+import hashlib
+import math
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional, Tuple
+
+from security import verify_password
+
+
+# 同时执行bcrypt校验的线程数
+LOGIN_VERIFY_WORKERS = int(os.getenv("LOGIN_VERIFY_WORKERS", "2"))
+# 允许排队等待校验的请求数，超出返回503
+LOGIN_VERIFY_QUEUE = int(os.getenv("LOGIN_VERIFY_QUEUE", "16"))
+# 校验成功结果的缓存时间（秒），0表示不缓存
+LOGIN_VERIFY_CACHE_TTL = float(os.getenv("LOGIN_VERIFY_CACHE_TTL", "60"))
+# 允许缓存校验结果的服务账号用户名，逗号分隔；为空则不缓存任何账号
+LOGIN_VERIFY_CACHE_USERS = frozenset(
+    name.strip() for name in os.getenv("LOGIN_VERIFY_CACHE_USERS", "").split(",") if name.strip()
+)
+# 同一用户名在窗口期内最多失败次数，超出返回429直到窗口结束
+LOGIN_MAX_FAILURES = int(os.getenv("LOGIN_MAX_FAILURES", "5"))
+LOGIN_FAILURE_WINDOW = int(os.getenv("LOGIN_FAILURE_WINDOW", "300"))
+
+_MAX_TRACKED = 10000
+
+
+class LoginBusy(Exception):
+    """校验线程池已满"""
+
+
+_executor = ThreadPoolExecutor(max_workers=LOGIN_VERIFY_WORKERS, thread_name_prefix="login-verify")
+_slots = threading.BoundedSemaphore(LOGIN_VERIFY_WORKERS + LOGIN_VERIFY_QUEUE)
+
+_lock = threading.Lock()
+# 用户名 -> (窗口开始时间, 失败次数)
+_failures: Dict[str, Tuple[float, int]] = {}
+# (用户名, sha256(密码+哈希)) -> 过期时间；密码哈希变化后自然失效
+_verified: Dict[Tuple[str, str], float] = {}
+
+
+def _prune(entries: dict, expired) -> None:
+    if len(entries) >= _MAX_TRACKED:
+        for key in [k for k, v in entries.items() if expired(v)]:
+            del entries[key]
+
+
+def retry_after(username: str) -> Optional[int]:
+    """用户名被暂时锁定时返回需等待的秒数，否则返回None"""
+    now = time.monotonic()
+    with _lock:
+        entry = _failures.get(username)
+        if entry is None:
+            return None
+        window_end = entry[0] + LOGIN_FAILURE_WINDOW
+        if window_end <= now:
+            del _failures[username]
+            return None
+        if entry[1] >= LOGIN_MAX_FAILURES:
+            return max(1, math.ceil(window_end - now))
+        return None
+
+
+def record_failure(username: str) -> None:
+    now = time.monotonic()
+    with _lock:
+        entry = _failures.get(username)
+        if entry is None or entry[0] + LOGIN_FAILURE_WINDOW <= now:
+            _prune(_failures, lambda v: v[0] + LOGIN_FAILURE_WINDOW <= now)
+            _failures[username] = (now, 1)
+        else:
+            _failures[username] = (entry[0], entry[1] + 1)
+
+
+def record_success(username: str) -> None:
+    with _lock:
+        _failures.pop(username, None)
+
+
+def _cache_key(username: str, password: str, hashed_password: str) -> Tuple[str, str]:
+    digest = hashlib.sha256(f"{password}\x00{hashed_password}".encode("utf-8")).hexdigest()
+    return username, digest
+
+
+async def verify_password_async(username: str, password: str, hashed_password: str) -> bool:
+    """
+    在独立线程池中校验密码
+
+    Raises:
+        LoginBusy: 正在执行和排队的校验已达上限
+    """
+    cacheable = LOGIN_VERIFY_CACHE_TTL > 0 and username in LOGIN_VERIFY_CACHE_USERS
+    key = _cache_key(username, password, hashed_password)
+    now = time.monotonic()
+    if cacheable:
+        with _lock:
+            expires_at = _verified.get(key)
+            if expires_at is not None:
+                if expires_at > now:
+                    return True
+                del _verified[key]
+
+    if not _slots.acquire(blocking=False):
+        raise LoginBusy()
+    try:
+        loop = asyncio.get_running_loop()
+        ok = await loop.run_in_executor(_executor, verify_password, password, hashed_password)
+    finally:
+        _slots.release()
+
+    if ok and cacheable:
+        with _lock:
+            _prune(_verified, lambda v: v <= now)
+            _verified[key] = time.monotonic() + LOGIN_VERIFY_CACHE_TTL
+    return ok
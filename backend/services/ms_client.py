@@ -1,4 +1,7 @@
 import base64
+import os
+import random
+import threading
 import time
 import uuid
 from dataclasses import dataclass
@@ -32,6 +35,71 @@ def build_headers(ak: str, sk: str) -> Dict[str, str]:
     }
 
 
+class TokenBucket:
+    """Process-wide token bucket with AIMD rate adaptation.
+
+    Every MeterSphere call takes a token first. The refill rate is halved when
+    MeterSphere pushes back (429/503) and creeps back towards max_rate on
+    success, so all sync jobs together hover just under the server's limit.
+    """
+
+    def __init__(self, max_rate: float, capacity: float, min_rate: float = 0.5):
+        self.max_rate = max_rate
+        self.min_rate = min(min_rate, max_rate)
+        self.rate = max_rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self) -> None:
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def throttle(self) -> None:
+        with self.lock:
+            self._refill(time.monotonic())
+            self.rate = max(self.min_rate, self.rate / 2)
+
+    def recover(self) -> None:
+        with self.lock:
+            self._refill(time.monotonic())
+            self.rate = min(self.max_rate, self.rate + self.max_rate * 0.05)
+
+
+MS_RATE_LIMIT = float(os.getenv("MS_RATE_LIMIT", "10"))  # requests per second
+MS_RATE_BURST = float(os.getenv("MS_RATE_BURST", "20"))
+MS_MAX_RETRIES = int(os.getenv("MS_MAX_RETRIES", "4"))
+MS_BACKOFF_BASE = 0.5
+MS_BACKOFF_CAP = 30.0
+
+_RETRY_STATUSES = {429, 500, 502, 503, 504}
+_THROTTLE_STATUSES = {429, 503}
+
+limiter = TokenBucket(max_rate=MS_RATE_LIMIT, capacity=MS_RATE_BURST)
+
+
+def _backoff_seconds(attempt: int, retry_after: Optional[str] = None) -> float:
+    if retry_after:
+        try:
+            return min(MS_BACKOFF_CAP, float(retry_after))
+        except ValueError:
+            pass
+    # exponential backoff with full jitter
+    return random.uniform(0, min(MS_BACKOFF_CAP, MS_BACKOFF_BASE * (2 ** attempt)))
+
+
 @dataclass
 class MSClient:
     base_url: str
@@ -39,9 +107,29 @@ class MSClient:
     sk: str
 
     def post(self, path: str, json: Any) -> requests.Response:
-        headers = build_headers(self.ak, self.sk)
         url = self.base_url.rstrip("/") + path
-        return requests.post(url, json=json, headers=headers, timeout=30)
+        attempt = 0
+        while True:
+            limiter.acquire()
+            # signature embeds a timestamp + nonce, so build fresh headers per attempt
+            headers = build_headers(self.ak, self.sk)
+            try:
+                resp = requests.post(url, json=json, headers=headers, timeout=30)
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt >= MS_MAX_RETRIES:
+                    raise
+                time.sleep(_backoff_seconds(attempt))
+                attempt += 1
+                continue
+            if resp.status_code in _THROTTLE_STATUSES:
+                limiter.throttle()
+            if resp.status_code in _RETRY_STATUSES and attempt < MS_MAX_RETRIES:
+                time.sleep(_backoff_seconds(attempt, resp.headers.get("Retry-After")))
+                attempt += 1
+                continue
+            if resp.status_code < 400:
+                limiter.recover()
+            return resp
 
     def fetch_scenario_reports(
         self,
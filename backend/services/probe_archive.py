@@ -0,0 +1,275 @@
+"""
+拨测结果归档与保留
+超过保留期的ProbeResult按 项目+月份 写入gzip压缩的NDJSON归档文件后从热表删除，
+load_results 对热表和归档透明读取，保证历史周期的SLO仍可重算
+"""
+import gzip
+import json
+import os
+import threading
+import time
+from datetime import datetime
+from functools import lru_cache
+from typing import Dict, List, Optional
+
+from sqlmodel import Session, delete, func, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from db import engine
+from models import ProbeArchive, ProbeResult
+
+
+# 热表保留的完整月份数（不含当月），0表示不归档
+PROBE_RETENTION_MONTHS = int(os.getenv("PROBE_RETENTION_MONTHS", "13"))
+PROBE_ARCHIVE_DIR = os.getenv("PROBE_ARCHIVE_DIR", "probe_archive")
+
+_DATETIME_FIELDS = ("start_time", "end_time", "created_at")
+_DELETE_BATCH_SIZE = 1000
+
+
+def _month_start(dt: datetime) -> datetime:
+    return datetime(dt.year, dt.month, 1)
+
+
+def _add_months(dt: datetime, months: int) -> datetime:
+    index = dt.year * 12 + dt.month - 1 + months
+    return datetime(index // 12, index % 12 + 1, 1)
+
+
+def _period_value(month_start: datetime) -> str:
+    return f"{month_start.year}-{month_start.month:02d}"
+
+
+def _archive_path(project_ms_id: str, period_value: str) -> str:
+    return os.path.join(PROBE_ARCHIVE_DIR, project_ms_id, f"{period_value}.ndjson.gz")
+
+
+def _row_to_dict(rec: ProbeResult) -> dict:
+    data = rec.model_dump()
+    for key in _DATETIME_FIELDS:
+        if data.get(key) is not None:
+            data[key] = data[key].isoformat()
+    return data
+
+
+def _dict_to_row(data: dict) -> ProbeResult:
+    data = dict(data)
+    for key in _DATETIME_FIELDS:
+        if data.get(key) is not None:
+            data[key] = datetime.fromisoformat(data[key])
+    return ProbeResult(**data)
+
+
+@lru_cache(maxsize=32)
+def _read_archive_file(path: str, mtime: float) -> List[dict]:
+    # mtime参与缓存键，文件被合并重写后自动失效
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def _read_archive(path: str) -> List[dict]:
+    if not os.path.exists(path):
+        return []
+    return _read_archive_file(path, os.path.getmtime(path))
+
+
+def _stream_archive(path: str):
+    """逐行读取归档文件，不经过缓存，内存占用与文件大小无关"""
+    if not os.path.exists(path):
+        return
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def _write_archive(path: str, rows: List[dict]) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + ".tmp"
+    with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+        for row in rows:
+            f.write(json.dumps(row, ensure_ascii=False))
+            f.write("\n")
+    os.replace(tmp_path, path)
+
+
+def archive_month(session: Session, project_ms_id: str, month_start: datetime) -> int:
+    """
+    将项目某月的热表数据归档，返回归档的行数
+
+    先写文件再提交删除；若中途失败，热表与归档会短暂重复，读取时按report_id去重
+    """
+    month_end = _add_months(month_start, 1)
+    rows = session.exec(
+        select(ProbeResult).where(
+            ProbeResult.project_ms_id == project_ms_id,
+            ProbeResult.start_time >= month_start,
+            ProbeResult.start_time < month_end,
+        )
+    ).all()
+    if not rows:
+        return 0
+
+    period_value = _period_value(month_start)
+    archive = session.exec(
+        select(ProbeArchive).where(
+            ProbeArchive.project_ms_id == project_ms_id,
+            ProbeArchive.period_value == period_value,
+        )
+    ).first()
+    path = archive.path if archive else _archive_path(project_ms_id, period_value)
+
+    # 迟到的数据与已有归档合并
+    merged: Dict[str, dict] = {row["report_id"]: row for row in _read_archive(path)}
+    for rec in rows:
+        merged[rec.report_id] = _row_to_dict(rec)
+    archived = sorted(merged.values(), key=lambda r: r["start_time"])
+    _write_archive(path, archived)
+
+    now = datetime.utcnow()
+    if archive is None:
+        archive = ProbeArchive(project_ms_id=project_ms_id, period_value=period_value, path=path, created_at=now)
+    archive.row_count = len(archived)
+    archive.min_start_time = datetime.fromisoformat(archived[0]["start_time"])
+    archive.max_start_time = datetime.fromisoformat(archived[-1]["start_time"])
+    archive.updated_at = now
+    session.add(archive)
+
+    ids = [rec.id for rec in rows]
+    for i in range(0, len(ids), _DELETE_BATCH_SIZE):
+        session.exec(delete(ProbeResult).where(ProbeResult.id.in_(ids[i:i + _DELETE_BATCH_SIZE])))
+    session.commit()
+    return len(rows)
+
+
+def run_retention(session: Session, retention_months: Optional[int] = None) -> int:
+    """归档所有早于保留期的月份，返回归档的总行数"""
+    if retention_months is None:
+        retention_months = PROBE_RETENTION_MONTHS
+    if retention_months <= 0:
+        return 0
+    cutoff = _add_months(_month_start(datetime.utcnow()), -retention_months)
+
+    oldest = session.exec(
+        select(ProbeResult.project_ms_id, func.min(ProbeResult.start_time))
+        .where(ProbeResult.start_time < cutoff)
+        .group_by(ProbeResult.project_ms_id)
+    ).all()
+
+    total = 0
+    for project_ms_id, min_start in oldest:
+        month = _month_start(min_start)
+        while month < cutoff:
+            try:
+                total += archive_month(session, project_ms_id, month)
+            except Exception as e:  # noqa: BLE001
+                session.rollback()
+                print(f"Error archiving {_period_value(month)} for project {project_ms_id}: {e}")
+            month = _add_months(month, 1)
+    return total
+
+
+async def archived_before(session: AsyncSession, project_ms_id: str) -> Optional[datetime]:
+    """
+    热表完整覆盖的起点：最后一个已归档月份的下个月初；没有归档时返回None
+
+    早于该时间的拨测结果只能通过 load_results / iter_archived_rows 读取
+    """
+    latest = (await session.exec(
+        select(func.max(ProbeArchive.max_start_time)).where(ProbeArchive.project_ms_id == project_ms_id)
+    )).one()
+    return _add_months(_month_start(latest), 1) if latest is not None else None
+
+
+def load_results(
+    session: Session,
+    project_ms_id: str,
+    start_time: datetime,
+    end_time: datetime,
+    is_valid: Optional[bool] = None,
+) -> List[ProbeResult]:
+    """
+    读取 [start_time, end_time) 内的拨测结果，按start_time升序，透明合并热表与归档
+
+    归档行以未持久化的ProbeResult返回，只可读
+    """
+    stmt = select(ProbeResult).where(
+        ProbeResult.project_ms_id == project_ms_id,
+        ProbeResult.start_time >= start_time,
+        ProbeResult.start_time < end_time,
+    )
+    if is_valid is not None:
+        stmt = stmt.where(ProbeResult.is_valid == is_valid)
+    hot = session.exec(stmt.order_by(ProbeResult.start_time.asc())).all()
+
+    archives = session.exec(
+        select(ProbeArchive).where(
+            ProbeArchive.project_ms_id == project_ms_id,
+            ProbeArchive.min_start_time < end_time,
+            ProbeArchive.max_start_time >= start_time,
+        )
+    ).all()
+    if not archives:
+        return list(hot)
+
+    hot_ids = {rec.report_id for rec in hot}
+    results = list(hot)
+    for archive in archives:
+        for data in _read_archive(archive.path):
+            if data["report_id"] in hot_ids:
+                continue
+            if is_valid is not None and bool(data.get("is_valid")) != is_valid:
+                continue
+            rec = _dict_to_row(data)
+            if start_time <= rec.start_time < end_time:
+                results.append(rec)
+    results.sort(key=lambda r: r.start_time)
+    return results
+
+
+def iter_archived_rows(session: Session, project_ms_id: str, start_time: datetime, end_time: datetime):
+    """
+    按月份顺序逐行读取与 [start_time, end_time) 相交的归档文件，返回原始字典
+
+    时间字段保持ISO字符串；文件逐行解压，不经过缓存。与 load_results 一致，热表中仍存在的行
+    （归档中途失败时）以热表为准，这里跳过；去重只查询当前归档月份范围内的热表report_id
+    """
+    archives = session.exec(
+        select(ProbeArchive).where(
+            ProbeArchive.project_ms_id == project_ms_id,
+            ProbeArchive.min_start_time < end_time,
+            ProbeArchive.max_start_time >= start_time,
+        ).order_by(ProbeArchive.period_value.asc())
+    ).all()
+    for archive in archives:
+        hot_ids = set(session.exec(
+            select(ProbeResult.report_id).where(
+                ProbeResult.project_ms_id == project_ms_id,
+                ProbeResult.start_time >= max(start_time, archive.min_start_time),
+                ProbeResult.start_time <= archive.max_start_time,
+                ProbeResult.start_time < end_time,
+            )
+        ).all())
+        for data in _stream_archive(archive.path):
+            if data["report_id"] in hot_ids:
+                continue
+            start = datetime.fromisoformat(data["start_time"])
+            if start_time <= start < end_time:
+                yield data
+
+
+def start_retention_job(interval_hours: int = 24) -> None:
+    """启动归档定时任务"""
+    def _loop() -> None:
+        while True:
+            try:
+                with Session(engine) as session:
+                    archived = run_retention(session)
+                if archived:
+                    print(f"Archived {archived} probe results")
+            except Exception as e:
+                print(f"Error in probe retention job: {e}")
+            time.sleep(interval_hours * 3600)
+
+    thread = threading.Thread(target=_loop, name="probe-retention", daemon=True)
+    thread.start()
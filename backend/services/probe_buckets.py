@@ -0,0 +1,250 @@
+"""
+拨测结果小时汇总
+每个项目每小时一行：拨测次数、失败次数、中断时间。拨测结果写入或改标后只重算受影响的小时，
+热力图等长时间范围的查询直接读汇总表，不再扫描拨测明细；已有的历史数据由后台任务逐月补算
+"""
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import Session, func, select
+
+from db import engine
+from models import ProbeArchive, ProbeBucketBackfill, ProbeHourlyBucket, ProbeResult
+from services.probe_archive import load_results
+from services.slo_calculator import calculate_downtime_for_project, get_expected_interval, iter_downtime_pairs
+
+
+HOUR = timedelta(hours=1)
+
+
+def floor_hour(dt: datetime) -> datetime:
+    return dt.replace(minute=0, second=0, microsecond=0)
+
+
+def ceil_hour(dt: datetime) -> datetime:
+    hour = floor_hour(dt)
+    return hour if hour == dt else hour + HOUR
+
+
+def _next_month(dt: datetime) -> datetime:
+    return datetime(dt.year + 1, 1, 1) if dt.month == 12 else datetime(dt.year, dt.month + 1, 1)
+
+
+def _period_value(month_start: datetime) -> str:
+    return f"{month_start.year}-{month_start.month:02d}"
+
+
+def refresh_hourly_buckets(session: Session, project_ms_id: str, start_time: datetime, end_time: datetime) -> int:
+    """
+    重算 [start_time, end_time] 覆盖的小时汇总，返回写入的小时数
+
+    按自然月分段计算并提交，长时间范围（如首次同步历史数据）也只占用一个月的内存
+    """
+    total = 0
+    chunk_start = start_time
+    while chunk_start <= end_time:
+        month_end = _next_month(datetime(chunk_start.year, chunk_start.month, 1)) - HOUR
+        total += _refresh_range(session, project_ms_id, chunk_start, min(month_end, end_time))
+        chunk_start = month_end + HOUR
+    return total
+
+
+def refresh_hourly_buckets_quietly(session: Session, project_ms_id: str, start_time: datetime, end_time: datetime) -> None:
+    """
+    在拨测结果已提交之后刷新小时汇总；失败时回滚并记录日志，不影响已完成的写入
+    """
+    try:
+        refresh_hourly_buckets(session, project_ms_id, start_time, end_time)
+    except Exception as e:  # noqa: BLE001
+        session.rollback()
+        print(f"Error refreshing hourly buckets for project {project_ms_id}: {e}")
+
+
+def _refresh_range(session: Session, project_ms_id: str, start_time: datetime, end_time: datetime) -> int:
+    """
+    重算不跨月的一段时间的小时汇总
+
+    中断计入前一次失败所在的小时，因此向前多算一个拨测间隔（新失败可能与上一小时的失败配对），
+    向后多读一个拨测间隔（小时末的失败需要与下一次失败配对）
+    """
+    expected_interval = get_expected_interval(session, project_ms_id)
+    pair_window = timedelta(seconds=(expected_interval or 0) * 1.1)
+    first_hour = floor_hour(start_time - pair_window)
+    end_hour = floor_hour(end_time) + HOUR
+
+    results = load_results(session, project_ms_id, first_hour, end_hour + pair_window)
+
+    buckets: Dict[datetime, ProbeHourlyBucket] = {}
+
+    def _bucket(hour: datetime) -> ProbeHourlyBucket:
+        bucket = buckets.get(hour)
+        if bucket is None:
+            bucket = buckets[hour] = ProbeHourlyBucket(project_ms_id=project_ms_id, bucket_start=hour)
+        return bucket
+
+    failed = []
+    for rec in results:
+        if rec.is_valid:
+            failed.append(rec)
+        if rec.start_time < end_hour:
+            bucket = _bucket(floor_hour(rec.start_time))
+            bucket.probe_count += 1
+            if rec.is_valid:
+                bucket.failed_count += 1
+    if expected_interval is not None:
+        for started, downtime in iter_downtime_pairs(failed, expected_interval):
+            if started < end_hour:
+                _bucket(floor_hour(started)).downtime_seconds += downtime
+
+    # 另一个worker同时写入同一小时会违反唯一约束，回滚后重读已有行再写一次
+    for attempt in range(2):
+        try:
+            _save_buckets(session, project_ms_id, first_hour, end_hour, buckets)
+            break
+        except IntegrityError:
+            session.rollback()
+            if attempt:
+                raise
+    # 向前多算的小时属于上一段，不重复计数
+    range_start = floor_hour(start_time)
+    return sum(1 for hour in buckets if hour >= range_start)
+
+
+def _save_buckets(
+    session: Session,
+    project_ms_id: str,
+    first_hour: datetime,
+    end_hour: datetime,
+    buckets: Dict[datetime, ProbeHourlyBucket],
+) -> None:
+    existing = {
+        b.bucket_start: b
+        for b in session.exec(
+            select(ProbeHourlyBucket).where(
+                ProbeHourlyBucket.project_ms_id == project_ms_id,
+                ProbeHourlyBucket.bucket_start >= first_hour,
+                ProbeHourlyBucket.bucket_start < end_hour,
+            )
+        ).all()
+    }
+    now = datetime.utcnow()
+    for hour, bucket in buckets.items():
+        row = existing.pop(hour, None)
+        if row is None:
+            row = bucket
+        else:
+            row.probe_count = bucket.probe_count
+            row.failed_count = bucket.failed_count
+            row.downtime_seconds = bucket.downtime_seconds
+        row.updated_at = now
+        session.add(row)
+    # 小时内的拨测结果已全部不存在
+    for row in existing.values():
+        session.delete(row)
+    session.commit()
+
+
+def _data_spans(session: Session, project_ms_id: Optional[str] = None) -> Dict[str, List[datetime]]:
+    """各项目已有拨测数据（含归档）的最早、最晚开始时间"""
+    spans: Dict[str, List[datetime]] = {}
+    hot = select(ProbeResult.project_ms_id, func.min(ProbeResult.start_time), func.max(ProbeResult.start_time))
+    archived = select(
+        ProbeArchive.project_ms_id, func.min(ProbeArchive.min_start_time), func.max(ProbeArchive.max_start_time)
+    )
+    if project_ms_id:
+        hot = hot.where(ProbeResult.project_ms_id == project_ms_id)
+        archived = archived.where(ProbeArchive.project_ms_id == project_ms_id)
+    for stmt in (hot.group_by(ProbeResult.project_ms_id), archived.group_by(ProbeArchive.project_ms_id)):
+        for pid, first, last in session.exec(stmt).all():
+            if first is None:
+                continue
+            span = spans.setdefault(pid, [first, last])
+            span[0], span[1] = min(span[0], first), max(span[1], last)
+    return spans
+
+
+def backfill_hourly_buckets(session: Session, project_ms_id: Optional[str] = None) -> int:
+    """
+    按月重算已有拨测数据（含归档）的小时汇总，返回写入的小时数
+
+    每完成一个 项目+月份 记录一次进度，已记录的月份跳过，中断后重新执行会从未完成的月份继续。
+    记录之后写入的数据由写入方自行刷新汇总
+    """
+    done = set(session.exec(select(ProbeBucketBackfill.project_ms_id, ProbeBucketBackfill.period_value)).all())
+    total = 0
+    for pid, (first, last) in _data_spans(session, project_ms_id).items():
+        month = datetime(first.year, first.month, 1)
+        while month <= last:
+            period_value = _period_value(month)
+            next_month = _next_month(month)
+            if (pid, period_value) not in done:
+                total += _refresh_range(session, pid, month, next_month - HOUR)
+                session.add(ProbeBucketBackfill(
+                    project_ms_id=pid, period_value=period_value, completed_at=datetime.utcnow()
+                ))
+                try:
+                    session.commit()
+                except IntegrityError:
+                    # 另一个worker已补算完同一月份
+                    session.rollback()
+            month = next_month
+    return total
+
+
+def start_bucket_backfill_job(retry_seconds: int = 300) -> None:
+    """启动小时汇总补算任务，全部月份补算完成后线程退出，失败时稍后重试"""
+    def _run() -> None:
+        while True:
+            try:
+                with Session(engine) as session:
+                    hours = backfill_hourly_buckets(session)
+                if hours:
+                    print(f"Backfilled {hours} hourly probe buckets")
+                return
+            except Exception as e:
+                print(f"Error backfilling hourly probe buckets: {e}")
+                time.sleep(retry_seconds)
+
+    thread = threading.Thread(target=_run, name="probe-bucket-backfill", daemon=True)
+    thread.start()
+
+
+def downtime_for_range(session: Session, project_ms_id: str, start_time: datetime, end_time: datetime) -> float:
+    """
+    任意时间段 [start_time, end_time) 的累计中断时间（秒），结果与 calculate_downtime_for_project 一致
+
+    整点小时部分直接累加小时汇总，只在首尾不足一小时的部分及跨越结束时间的连续失败上读取拨测明细
+    """
+    expected_interval = get_expected_interval(session, project_ms_id)
+    if expected_interval is None:
+        return 0.0
+    first_hour, end_hour = ceil_hour(start_time), floor_hour(end_time)
+    if first_hour >= end_hour:
+        return calculate_downtime_for_project(session, project_ms_id, start_time, end_time)
+    pair_window = timedelta(seconds=expected_interval * 1.1)
+
+    downtime = float(session.exec(
+        select(func.coalesce(func.sum(ProbeHourlyBucket.downtime_seconds), 0.0)).where(
+            ProbeHourlyBucket.project_ms_id == project_ms_id,
+            ProbeHourlyBucket.bucket_start >= first_hour,
+            ProbeHourlyBucket.bucket_start < end_hour,
+        )
+    ).one())
+
+    # 开头不足一小时：前一次失败在 [start_time, first_hour) 的中断
+    if start_time < first_hour:
+        head = load_results(session, project_ms_id, start_time, min(first_hour + pair_window, end_time), is_valid=True)
+        downtime += sum(d for started, d in iter_downtime_pairs(head, expected_interval) if started < first_hour)
+
+    # 结尾：补上 [end_hour, end_time) 内的中断，扣除汇总中后一次失败落在 end_time 之后的中断
+    tail = load_results(session, project_ms_id, max(end_hour - pair_window, start_time), end_time + pair_window, is_valid=True)
+    for started, d in iter_downtime_pairs(tail, expected_interval):
+        ended = started + timedelta(seconds=d)
+        if started >= end_hour and ended < end_time:
+            downtime += d
+        elif first_hour <= started < end_hour and ended >= end_time:
+            downtime -= d
+    return downtime
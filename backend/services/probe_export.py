@@ -0,0 +1,128 @@
+"""
+拨测结果流式导出
+热表通过服务端游标按批读取，归档按月份逐个文件逐行解压读取，边读边编码为NDJSON或CSV，
+可选gzip压缩；导出过程中内存占用与总行数无关
+"""
+import csv
+import io
+import zlib
+from datetime import datetime
+from typing import Iterator, List, Optional
+
+import orjson
+from sqlmodel import Session, select
+
+from db import read_engine
+from models import ProbeResult
+from schemas import ProbeResultOut
+from services.probe_archive import iter_archived_rows
+
+
+EXPORT_FIELDS = tuple(ProbeResultOut.model_fields)
+_EXPORT_COLUMNS = [getattr(ProbeResult, name) for name in EXPORT_FIELDS]
+
+# 服务端游标每批读取的行数
+_FETCH_SIZE = 2000
+# 累积到该字节数后输出一个块
+_CHUNK_BYTES = 64 * 1024
+
+
+def _iter_rows(
+    project_ms_id: str,
+    start_time: datetime,
+    end_time: datetime,
+    status: Optional[str],
+    is_valid: Optional[bool],
+) -> Iterator[tuple]:
+    with Session(read_engine) as session:
+        # 先输出已归档的月份（与热表重复的行已在读取归档时跳过），再输出热表
+        for data in iter_archived_rows(session, project_ms_id, start_time, end_time):
+            if status and data.get("status") != status:
+                continue
+            if is_valid is not None and bool(data.get("is_valid")) != is_valid:
+                continue
+            yield tuple(data.get(name) for name in EXPORT_FIELDS)
+
+        conditions = [
+            ProbeResult.project_ms_id == project_ms_id,
+            ProbeResult.start_time >= start_time,
+            ProbeResult.start_time < end_time,
+        ]
+        if status:
+            conditions.append(ProbeResult.status == status)
+        if is_valid is not None:
+            conditions.append(ProbeResult.is_valid == is_valid)
+        stmt = (
+            select(*_EXPORT_COLUMNS)
+            .where(*conditions)
+            .order_by(ProbeResult.start_time.asc(), ProbeResult.id.asc())
+            .execution_options(stream_results=True, yield_per=_FETCH_SIZE)
+        )
+        for row in session.exec(stmt):
+            yield tuple(row)
+
+
+def _format_value(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def _encode_ndjson(rows: Iterator[tuple]) -> Iterator[bytes]:
+    for row in rows:
+        yield orjson.dumps(dict(zip(EXPORT_FIELDS, row))) + b"\n"
+
+
+def _encode_csv(rows: Iterator[tuple]) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_FIELDS)
+    for row in rows:
+        writer.writerow([_format_value(v) for v in row])
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+def _chunked(parts: Iterator[bytes]) -> Iterator[bytes]:
+    pending: List[bytes] = []
+    size = 0
+    for part in parts:
+        pending.append(part)
+        size += len(part)
+        if size >= _CHUNK_BYTES:
+            yield b"".join(pending)
+            pending, size = [], 0
+    if pending:
+        yield b"".join(pending)
+
+
+def _gzipped(chunks: Iterator[bytes]) -> Iterator[bytes]:
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export_results(
+    project_ms_id: str,
+    start_time: datetime,
+    end_time: datetime,
+    fmt: str = "ndjson",
+    status: Optional[str] = None,
+    is_valid: Optional[bool] = None,
+    compress: bool = False,
+) -> Iterator[bytes]:
+    """
+    生成导出内容的字节块，按start_time升序（已归档的月份在前）
+
+    使用独立的只读会话，生成器被完整消费或关闭时释放连接
+    """
+    rows = _iter_rows(project_ms_id, start_time, end_time, status, is_valid)
+    encoded = _encode_csv(rows) if fmt == "csv" else _encode_ndjson(rows)
+    chunks = _chunked(encoded)
+    return _gzipped(chunks) if compress else chunks
@@ -0,0 +1,207 @@
+"""
+项目与拨测配置批量同步
+分页拉取Metersphere全部项目，并发获取各项目的拨测场景，按批写入Project/ProbeConfig
+"""
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from sqlmodel import Session, select
+
+from models import Project, ProbeConfig
+from services.ms_client import MSClient
+
+
+PROJECT_PAGE_SIZE = 100
+PROBE_FETCH_WORKERS = 8
+UPSERT_BATCH_SIZE = 200
+
+
+def _ms_ts_to_dt(value: Optional[int]) -> Optional[datetime]:
+    if isinstance(value, (int, float)):
+        try:
+            return datetime.utcfromtimestamp(int(value) / 1000)
+        except Exception:
+            return None
+    return None
+
+
+def _chunks(items: list, size: int):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def _post_page(client: MSClient, path: str, payload: dict) -> dict:
+    resp = client.post(path, json=payload)
+    if resp.status_code != 200:
+        raise RuntimeError(f"MS error: {resp.text}")
+    data = resp.json()
+    if data.get("code") != 100200:
+        raise RuntimeError(f"MS response error: {data}")
+    return data.get("data") or {}
+
+
+def fetch_all_projects(client: MSClient) -> List[dict]:
+    """分页获取Metersphere全部项目"""
+    items: List[dict] = []
+    page = 1
+    while True:
+        payload = {
+            "current": page,
+            "pageSize": PROJECT_PAGE_SIZE,
+            "sort": {},
+            "keyword": "",
+            "viewId": "",
+            "combineSearch": {"searchMode": "AND", "conditions": []},
+            "filter": {},
+        }
+        data = _post_page(client, "/system/project/page", payload)
+        page_list = data.get("list") or []
+        items.extend(page_list)
+        if not page_list or page * PROJECT_PAGE_SIZE >= int(data.get("total") or 0):
+            break
+        page += 1
+    return items
+
+
+def fetch_probe_scenario(client: MSClient, project_ms_id: str) -> Optional[dict]:
+    """获取项目的拨测场景（名称为“拨测”的第一个场景），没有则返回None"""
+    payload = {
+        "current": 1,
+        "pageSize": 10,
+        "sort": {},
+        "keyword": "",
+        "viewId": "all_data",
+        "combineSearch": {
+            "searchMode": "AND",
+            "conditions": [
+                {
+                    "value": "拨测",
+                    "operator": "EQUALS",
+                    "customField": False,
+                    "name": "name",
+                    "customFieldType": "",
+                }
+            ],
+        },
+        "projectId": str(project_ms_id),
+        "moduleIds": [],
+        "filter": {},
+    }
+    items = _post_page(client, "/api/scenario/page", payload).get("list") or []
+    return items[0] if items else None
+
+
+def _apply_project_item(proj: Project, item: dict) -> None:
+    proj.ms_name = item.get("name") or ""
+    proj.ms_description = item.get("description") or None
+    proj.ms_createtime = _ms_ts_to_dt(item.get("createTime"))
+
+
+def _apply_probe_item(probe: ProbeConfig, project_ms_id: str, item: dict) -> None:
+    probe.project_ms_id = str(project_ms_id)
+    probe.scenario_id = str(item.get("id"))
+    probe.name = item.get("name") or ""
+    probe.priority = item.get("priority")
+    probe.status = item.get("status")
+    probe.step_total = item.get("stepTotal")
+    probe.request_pass_rate = item.get("requestPassRate")
+    probe.last_report_status = item.get("lastReportStatus")
+    probe.last_report_id = item.get("lastReportId")
+    probe.num = item.get("num")
+    probe.environment_name = item.get("environmentName")
+
+    sched = item.get("scheduleConfig") or {}
+    probe.schedule_enable = bool(sched.get("enable")) if sched is not None else None
+    probe.schedule_cron = (sched.get("cron") if isinstance(sched, dict) else None) or None
+
+    probe.next_trigger_time = _ms_ts_to_dt(item.get("nextTriggerTime"))
+    probe.create_time = _ms_ts_to_dt(item.get("createTime"))
+    probe.update_time = _ms_ts_to_dt(item.get("updateTime"))
+
+
+def upsert_projects(session: Session, items: List[dict]) -> int:
+    """按批写入项目，每批一次IN查询"""
+    upserted = 0
+    for chunk in _chunks(items, UPSERT_BATCH_SIZE):
+        ms_ids = [str(item.get("id")) for item in chunk]
+        existing = {
+            p.ms_id: p
+            for p in session.exec(select(Project).where(Project.ms_id.in_(ms_ids))).all()
+        }
+        for ms_id, item in zip(ms_ids, chunk):
+            proj = existing.get(ms_id)
+            if proj is None:
+                proj = existing[ms_id] = Project(ms_id=ms_id, ms_name="")
+            _apply_project_item(proj, item)
+            session.add(proj)
+            upserted += 1
+        session.commit()
+    return upserted
+
+
+def upsert_probe_configs(session: Session, scenarios: Dict[str, Optional[dict]]) -> Dict[str, int]:
+    """
+    按批写入拨测配置
+
+    Args:
+        scenarios: 项目ID -> 拨测场景；None表示该项目已没有拨测场景，删除已有配置
+    """
+    upserted = 0
+    removed = 0
+    for chunk in _chunks(list(scenarios.items()), UPSERT_BATCH_SIZE):
+        project_ids = [str(project_ms_id) for project_ms_id, _ in chunk]
+        scenario_ids = [str(item.get("id")) for _, item in chunk if item]
+        by_scenario = {
+            p.scenario_id: p
+            for p in session.exec(select(ProbeConfig).where(ProbeConfig.scenario_id.in_(scenario_ids))).all()
+        } if scenario_ids else {}
+        by_project: Dict[str, List[ProbeConfig]] = {}
+        for p in session.exec(select(ProbeConfig).where(ProbeConfig.project_ms_id.in_(project_ids))).all():
+            by_project.setdefault(p.project_ms_id, []).append(p)
+
+        for project_ms_id, item in chunk:
+            project_ms_id = str(project_ms_id)
+            if not item:
+                for probe in by_project.get(project_ms_id, []):
+                    session.delete(probe)
+                    removed += 1
+                continue
+            scenario_id = str(item.get("id"))
+            probe = by_scenario.get(scenario_id)
+            if probe is None:
+                probe = ProbeConfig(project_ms_id=project_ms_id, scenario_id=scenario_id, name=item.get("name") or "")
+            _apply_probe_item(probe, project_ms_id, item)
+            session.add(probe)
+            upserted += 1
+        session.commit()
+    return {"upserted": upserted, "removed": removed}
+
+
+def sync_projects_and_probes(session: Session, client: MSClient) -> dict:
+    """
+    批量同步：分页拉取全部项目，并发获取每个项目的拨测场景，再按批写入
+
+    单个项目获取拨测场景失败时不影响其他项目，也不会删除其已有配置
+    """
+    project_items = fetch_all_projects(client)
+    projects_upserted = upsert_projects(session, project_items)
+
+    project_ids = [str(item.get("id")) for item in project_items]
+    scenarios: Dict[str, Optional[dict]] = {}
+    errors: Dict[str, str] = {}
+    with ThreadPoolExecutor(max_workers=PROBE_FETCH_WORKERS) as pool:
+        futures = {pid: pool.submit(fetch_probe_scenario, client, pid) for pid in project_ids}
+        for pid, future in futures.items():
+            try:
+                scenarios[pid] = future.result()
+            except Exception as e:  # noqa: BLE001
+                errors[pid] = str(e)
+
+    probe_counts = upsert_probe_configs(session, scenarios)
+    return {
+        "projects": projects_upserted,
+        "probes": probe_counts["upserted"],
+        "probes_removed": probe_counts["removed"],
+        "errors": errors,
+    }
@@ -0,0 +1,165 @@
+"""
+In-memory index of known report_ids per project.
+
+Lets the ingest path decide insert / update / skip without a SELECT per
+report: report_ids inside the active sync window are kept in a dict together
+with their content fingerprint, older ones go into a Bloom filter that is only
+built when an out-of-window report actually shows up.
+"""
+import hashlib
+import math
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Tuple
+
+from sqlmodel import Session, select
+
+from models import ProbeResult
+
+
+_FINGERPRINT_FIELDS = (
+    "project_ms_id",
+    "name",
+    "start_time",
+    "end_time",
+    "request_duration_ms",
+    "status",
+    "error_count",
+    "success_count",
+)
+
+
+def _normalize(value):
+    # MySQL DATETIME columns keep whole seconds (rounded), so compare at that precision
+    if isinstance(value, datetime):
+        if value.microsecond >= 500000:
+            value = value + timedelta(seconds=1)
+        return value.replace(microsecond=0)
+    return value
+
+
+def result_fingerprint(values) -> str:
+    """Content fingerprint of the MeterSphere-owned fields of a result.
+
+    Accepts either a payload dict or a ProbeResult; local fields such as
+    is_valid / reason_label are deliberately excluded so relabelling never
+    makes a report look changed.
+    """
+    if isinstance(values, dict):
+        parts = [values.get(k) for k in _FINGERPRINT_FIELDS]
+    else:
+        parts = [getattr(values, k) for k in _FINGERPRINT_FIELDS]
+    raw = "\x1f".join("" if p is None else str(_normalize(p)) for p in parts)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+class BloomFilter:
+    def __init__(self, capacity: int, error_rate: float = 0.01):
+        capacity = max(capacity, 1024)
+        self.size = int(-capacity * math.log(error_rate) / (math.log(2) ** 2))
+        self.hashes = max(1, int(round(self.size / capacity * math.log(2))))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, key: str):
+        digest = hashlib.md5(key.encode("utf-8")).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        for i in range(self.hashes):
+            yield (h1 + i * h2) % self.size
+
+    def add(self, key: str) -> None:
+        for pos in self._positions(key):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, key: str) -> bool:
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(key))
+
+
+# lookup outcomes
+MISSING = "missing"      # definitely not stored -> plain insert
+UNKNOWN = "unknown"      # may be stored -> fall back to a SELECT
+
+
+class ReportIndex:
+    def __init__(self, project_ms_id: str):
+        self.project_ms_id = project_ms_id
+        self.window_start: Optional[datetime] = None
+        # report_id -> (start_time, fingerprint) for rows inside the window
+        self.recent: Dict[str, Tuple[datetime, str]] = {}
+        self.older: Optional[BloomFilter] = None
+        self.lock = threading.RLock()
+
+    def reset(self) -> None:
+        self.window_start = None
+        self.recent = {}
+        self.older = None
+
+    def prepare(self, session: Session, window_start: datetime) -> None:
+        """Make sure the index covers [window_start, now).
+
+        Moving the window forward just evicts entries; moving it backwards
+        (or the first call) rebuilds from one range query.
+        """
+        if self.window_start is not None and window_start >= self.window_start:
+            evicted = [rid for rid, (st, _) in self.recent.items() if st < window_start]
+            for rid in evicted:
+                del self.recent[rid]
+                if self.older is not None:
+                    self.older.add(rid)
+            self.window_start = window_start
+            return
+
+        # stored start_times are rounded to the second, so read one second of slack
+        rows = session.exec(
+            select(ProbeResult).where(
+                ProbeResult.project_ms_id == self.project_ms_id,
+                ProbeResult.start_time >= window_start - timedelta(seconds=1),
+            )
+        ).all()
+        self.recent = {r.report_id: (r.start_time, result_fingerprint(r)) for r in rows}
+        self.window_start = window_start
+        self.older = None
+
+    def _ensure_older(self, session: Session) -> BloomFilter:
+        if self.older is None:
+            ids = session.exec(
+                select(ProbeResult.report_id).where(
+                    ProbeResult.project_ms_id == self.project_ms_id,
+                    ProbeResult.start_time < self.window_start,
+                )
+            ).all()
+            self.older = BloomFilter(capacity=len(ids) * 2)
+            for rid in ids:
+                self.older.add(rid)
+        return self.older
+
+    def lookup(self, session: Session, report_id: str, start_time: datetime) -> Optional[str]:
+        """Return the stored fingerprint, MISSING or UNKNOWN."""
+        if self.window_start is None:
+            return UNKNOWN
+        hit = self.recent.get(report_id)
+        if hit is not None:
+            return hit[1]
+        if start_time >= self.window_start:
+            return MISSING
+        return UNKNOWN if report_id in self._ensure_older(session) else MISSING
+
+    def remember(self, report_id: str, start_time: datetime, fingerprint: str) -> None:
+        if self.window_start is None:
+            return
+        if start_time >= self.window_start:
+            self.recent[report_id] = (start_time, fingerprint)
+        elif self.older is not None:
+            self.older.add(report_id)
+
+
+_indexes: Dict[str, ReportIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def get_report_index(project_ms_id: str) -> ReportIndex:
+    with _indexes_lock:
+        index = _indexes.get(project_ms_id)
+        if index is None:
+            index = _indexes[project_ms_id] = ReportIndex(project_ms_id)
+        return index
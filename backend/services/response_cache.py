@@ -0,0 +1,102 @@
+"""
+大屏/分析接口的响应缓存
+按 (接口, 项目, 参数) 缓存响应体并生成ETag；TTL到期或项目版本号变化即失效。
+ETag由响应内容计算（不含生成时间等每次都变的字段），缓存重建后内容未变时客户端仍可得到304。
+SLORecord/SLOConfig 等数据写入后调用 bump_version 使该项目的全部缓存失效。
+"""
+import hashlib
+import os
+import threading
+import time
+from typing import Any, Dict, NamedTuple, Optional, Tuple
+
+import orjson
+from fastapi import Request, Response
+
+
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "30"))
+_MAX_ENTRIES = 4096
+# 每次构建都会变化、不代表数据变化的字段，不参与ETag计算
+_VOLATILE_FIELDS = frozenset({"last_updated", "age_seconds"})
+
+
+class CachedResponse(NamedTuple):
+    etag: str
+    payload: Any
+    version: int
+    expires_at: float
+
+
+_lock = threading.Lock()
+_versions: Dict[str, int] = {}
+_entries: Dict[Tuple[str, str, Tuple], CachedResponse] = {}
+
+
+def current_version(project_ms_id: str) -> int:
+    with _lock:
+        return _versions.get(project_ms_id, 0)
+
+
+def bump_version(project_ms_id: str) -> None:
+    """项目数据发生变化，使其全部缓存失效"""
+    with _lock:
+        _versions[project_ms_id] = _versions.get(project_ms_id, 0) + 1
+
+
+def lookup(endpoint: str, project_ms_id: str, params: Tuple = ()) -> Optional[CachedResponse]:
+    key = (endpoint, project_ms_id, params)
+    with _lock:
+        entry = _entries.get(key)
+        if entry is None:
+            return None
+        if entry.version != _versions.get(project_ms_id, 0) or entry.expires_at <= time.monotonic():
+            del _entries[key]
+            return None
+        return entry
+
+
+def _stable_content(payload: Any) -> Any:
+    if isinstance(payload, dict):
+        return {k: _stable_content(v) for k, v in payload.items() if k not in _VOLATILE_FIELDS}
+    if isinstance(payload, (list, tuple)):
+        return [_stable_content(v) for v in payload]
+    return payload
+
+
+def content_etag(payload: Any) -> str:
+    body = orjson.dumps(
+        _stable_content(payload), option=orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS, default=str
+    )
+    return f'W/"{hashlib.sha1(body).hexdigest()[:20]}"'
+
+
+def store(endpoint: str, project_ms_id: str, params: Tuple, version: int, payload: Any) -> CachedResponse:
+    """
+    缓存响应体
+
+    version 需在构建响应之前通过 current_version 取得：构建期间若有写入，
+    版本号已变化，该条缓存下次查询即失效，避免缓存旧数据
+    """
+    now = time.monotonic()
+    entry = CachedResponse(
+        etag=content_etag(payload), payload=payload, version=version, expires_at=now + RESPONSE_CACHE_TTL
+    )
+    with _lock:
+        if len(_entries) >= _MAX_ENTRIES:
+            expired = [k for k, v in _entries.items() if v.expires_at <= now]
+            for k in expired or list(_entries)[: _MAX_ENTRIES // 4]:
+                del _entries[k]
+        _entries[(endpoint, project_ms_id, params)] = entry
+    return entry
+
+
+def respond(request: Request, response: Response, entry: CachedResponse):
+    """客户端ETag一致时返回304，否则返回缓存的响应体并带上ETag"""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        tags = [tag.strip() for tag in if_none_match.split(",")]
+        if "*" in tags or entry.etag in tags:
+            return Response(status_code=304, headers={"ETag": entry.etag, "Cache-Control": "no-cache"})
+    response.headers["ETag"] = entry.etag
+    response.headers["Cache-Control"] = "no-cache"
+    return entry.payload
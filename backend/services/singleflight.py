@@ -0,0 +1,71 @@
+"""
+单飞（single-flight）合并
+同一个key同时只执行一次。执行方开始读取数据之前到达的调用方直接共享这一次的结果；
+执行开始之后才到达的调用方可能依赖执行方没有读到的新写入，它们合并为紧随其后的一次重新执行，
+由其中第一个到达的调用方执行，其余调用方共享该结果
+"""
+import threading
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+
+class _Call:
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.started = False
+        # 执行开始后到达的调用方合并到的下一次执行
+        self.next: Optional["_Call"] = None
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Tuple[Any, bool]:
+        """
+        执行fn，若相同key已在执行则等待能反映本次调用之前所有写入的结果
+
+        Returns:
+            (结果, 是否为共享的结果)；执行方抛出的异常会同样抛给等待方
+        """
+        previous = None
+        with self._lock:
+            current = self._calls.get(key)
+            if current is None:
+                call = self._calls[key] = _Call()
+                leader = True
+            elif not current.started:
+                call, leader = current, False
+            elif current.next is None:
+                call = current.next = _Call()
+                previous, leader = current, True
+            else:
+                call, leader = current.next, False
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        if previous is not None:
+            # 上一次执行结束时会把本次登记为当前执行
+            previous.done.wait()
+        with self._lock:
+            call.started = True
+
+        try:
+            call.result = fn()
+            return call.result, False
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                if call.next is not None:
+                    self._calls[key] = call.next
+                else:
+                    del self._calls[key]
+            call.done.set()
@@ -3,10 +3,15 @@ SLO计算服务
 用于计算SLO达成率、误差预算消耗等指标
 """
 from datetime import datetime, timedelta
-from typing import Optional, List, Tuple
+from typing import Iterator, Optional, List, Tuple
+from sqlalchemy.exc import IntegrityError
 from sqlmodel import Session, select
 
-from models import ProbeResult, ProbeConfig, SLOConfig, SLORecord, Project
+from db import engine
+from models import ProbeConfig, ProbeResult, SLOConfig, SLORecord, Project
+from services import response_cache, slo_events
+from services.probe_archive import load_results
+from services.singleflight import SingleFlight
 
 try:
     from croniter import croniter
@@ -75,6 +80,45 @@ def parse_cron_interval(cron_expr: str) -> Optional[float]:
     return None
 
 
+def get_expected_interval(session: Session, project_ms_id: str) -> Optional[float]:
+    """
+    项目拨测的期望间隔（秒），取自probeconfig的schedule_cron，解析不了时默认5分钟
+
+    Returns:
+        项目没有拨测配置时返回None（不计算中断）
+    """
+    probe_config = session.exec(
+        select(ProbeConfig).where(ProbeConfig.project_ms_id == project_ms_id)
+    ).first()
+    if not probe_config:
+        return None
+    
+    # 对于一个项目，通常只有一个拨测配置，使用第一个配置的schedule_cron
+    expected_interval = 300.0  # 默认5分钟
+    if probe_config.schedule_cron:
+        parsed_interval = parse_cron_interval(probe_config.schedule_cron)
+        if parsed_interval is not None:
+            expected_interval = parsed_interval
+    return expected_interval
+
+
+def iter_downtime_pairs(
+    failed_results: List[ProbeResult],
+    expected_interval: float
+) -> Iterator[Tuple[datetime, float]]:
+    """
+    逐对检查按时间排序的失败结果，返回每次中断 (前一次失败的start_time, 中断秒数)
+    
+    两次失败的时间间隔在期望间隔的±10%范围内视为连续失败
+    """
+    tolerance = expected_interval * 0.1
+    for current, next_result in zip(failed_results, failed_results[1:]):
+        # 计算两次失败的时间间隔
+        time_diff = (next_result.start_time - current.start_time).total_seconds()
+        if abs(time_diff - expected_interval) <= tolerance:
+            yield current.start_time, time_diff
+
+
 def calculate_downtime_for_project(
     session: Session,
     project_ms_id: str,
@@ -98,60 +142,29 @@ def calculate_downtime_for_project(
     Returns:
         累计中断时间（秒）
     """
-    # 获取项目的拨测配置
-    probe_configs = session.exec(
-        select(ProbeConfig).where(ProbeConfig.project_ms_id == project_ms_id)
-    ).all()
-    
-    if not probe_configs:
+    expected_interval = get_expected_interval(session, project_ms_id)
+    if expected_interval is None:
         return 0.0
     
     # 获取时间段内的所有失败拨测结果（is_valid=1表示失败）
-    failed_results = session.exec(
-        select(ProbeResult)
-        .where(
-            ProbeResult.project_ms_id == project_ms_id,
-            ProbeResult.is_valid == True,  # noqa: E712
-            ProbeResult.start_time >= start_time,
-            ProbeResult.start_time < end_time
-        )
-        .order_by(ProbeResult.start_time.asc())
-    ).all()
-    
-    if len(failed_results) < 2:
-        return 0.0
+    # 热表与归档透明合并
+    failed_results = load_results(session, project_ms_id, start_time, end_time, is_valid=True)
     
-    # 获取项目的拨测配置（使用第一个配置的schedule_cron）
-    # 对于一个项目，通常只有一个拨测配置
-    expected_interval = 300.0  # 默认5分钟
-    if probe_configs:
-        probe_config = probe_configs[0]  # 使用第一个配置
-        if probe_config.schedule_cron:
-            parsed_interval = parse_cron_interval(probe_config.schedule_cron)
-            if parsed_interval is not None:
-                expected_interval = parsed_interval
-    
-    total_downtime = 0.0
-    
-    # 直接处理所有失败结果（已按时间排序）
-    i = 0
-    while i < len(failed_results) - 1:
-        current = failed_results[i]
-        next_result = failed_results[i + 1]
-        
-        # 计算两次失败的时间间隔
-        time_diff = (next_result.start_time - current.start_time).total_seconds()
-        
-        # 判断是否为连续失败（时间间隔在期望间隔的±10%范围内）
-        tolerance = expected_interval * 0.1
-        if abs(time_diff - expected_interval) <= tolerance:
-            # 连续失败，记录中断时间
-            total_downtime += time_diff
-            i += 1  
-        else:
-            i += 1
-    
-    return total_downtime
+    return sum(diff for _, diff in iter_downtime_pairs(failed_results, expected_interval))
+
+
+_slo_flight = SingleFlight()
+
+
+def _find_slo_record(session: Session, project_ms_id: str, period_type: str, period_value: str) -> Optional[SLORecord]:
+    # 会话中已加载的旧对象以数据库中的最新值覆盖
+    return session.exec(
+        select(SLORecord).where(
+            SLORecord.project_ms_id == project_ms_id,
+            SLORecord.period_type == period_type,
+            SLORecord.period_value == period_value
+        ).execution_options(populate_existing=True)
+    ).first()
 
 
 def calculate_slo_for_period(
@@ -163,6 +176,10 @@ def calculate_slo_for_period(
     """
     计算指定周期内的SLO
     
+    同一 (项目, 周期类型, 周期值) 的并发计算会合并：计算开始前到达的调用方共享这次计算，
+    计算开始后到达的调用方合并为紧随其后的一次重算，保证读到调用前的所有写入；
+    共享结果的调用方再在自己的会话中读取写入的记录
+    
     Args:
         session: 数据库会话
         project_ms_id: 项目ID
@@ -172,6 +189,24 @@ def calculate_slo_for_period(
     Returns:
         SLORecord对象
     """
+    key = (project_ms_id, period_type, period_value)
+    record, shared = _slo_flight.do(
+        key, lambda: _calculate_slo_for_period(session, project_ms_id, period_type, period_value)
+    )
+    if shared and record is not None:
+        # 结果属于执行方的会话，在当前会话中重新读取；
+        # 先结束当前事务（与执行方一样提交），避免REPEATABLE READ下读到事务开始时的快照
+        session.commit()
+        record = _find_slo_record(session, project_ms_id, period_type, period_value)
+    return record
+
+
+def _calculate_slo_for_period(
+    session: Session,
+    project_ms_id: str,
+    period_type: str,
+    period_value: str
+) -> Optional[SLORecord]:
     # 解析周期值，确定开始和结束时间
     if period_type == "monthly":
         # 月度：2025-11 -> 2025-11-01 00:00:00 到 2025-12-01 00:00:00
@@ -236,22 +271,20 @@ def calculate_slo_for_period(
     error_budget_consumption = min(1.0, max(0.0, error_budget_consumption))
     
     # 查找或创建SLORecord
-    slo_record = session.exec(
-        select(SLORecord).where(
-            SLORecord.project_ms_id == project_ms_id,
-            SLORecord.period_type == period_type,
-            SLORecord.period_value == period_value
-        )
-    ).first()
+    slo_record = _find_slo_record(session, project_ms_id, period_type, period_value)
     
     now = datetime.utcnow()
+    
+    def _apply(record: SLORecord) -> None:
+        record.total_downtime_seconds = total_downtime_seconds
+        record.achievement_rate = achievement_rate
+        record.error_budget_consumption = error_budget_consumption
+        record.calculated_at = now
+        record.updated_at = now
+    
     if slo_record:
         # 更新现有记录
-        slo_record.total_downtime_seconds = total_downtime_seconds
-        slo_record.achievement_rate = achievement_rate
-        slo_record.error_budget_consumption = error_budget_consumption
-        slo_record.calculated_at = now
-        slo_record.updated_at = now
+        _apply(slo_record)
     else:
         # 创建新记录
         slo_record = SLORecord(
@@ -267,11 +300,32 @@ def calculate_slo_for_period(
         )
         session.add(slo_record)
     
-    session.commit()
+    try:
+        session.commit()
+    except IntegrityError:
+        # 其他进程已插入同一周期的记录（uq_slo_record），改为更新该记录
+        session.rollback()
+        slo_record = _find_slo_record(session, project_ms_id, period_type, period_value)
+        if slo_record is None:
+            raise
+        _apply(slo_record)
+        session.commit()
     session.refresh(slo_record)
+    # 使该项目的大屏/分析缓存失效
+    response_cache.bump_version(project_ms_id)
+    # 推送给订阅了大屏变更的连接
+    slo_events.publish_slo_record(slo_record)
     return slo_record
 
 
+def recalculate_slo(project_ms_id: str, period_type: str, period_value: str) -> Optional[SLORecord]:
+    """
+    在独立的写会话中计算SLO，供使用只读会话的路由和后台任务调用
+    """
+    with Session(engine) as session:
+        return calculate_slo_for_period(session, project_ms_id, period_type, period_value)
+
+
 def calculate_all_projects_slo(session: Session) -> None:
     """
     计算所有项目的SLO（当前月和当前年）
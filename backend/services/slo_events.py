@@ -0,0 +1,119 @@
+"""
+SLO变更的进程内发布/订阅
+计算器和拨测结果推送在写入后发布精简的变更消息，/slo/screen/stream 的每个连接
+订阅一个队列；消息只序列化一次，分发给订阅者时不再查询数据库。
+发布方可以在任意线程调用，消息通过订阅者所在事件循环的 call_soon_threadsafe 投递。
+"""
+import asyncio
+import json
+import threading
+from datetime import datetime
+from typing import Iterable, List, Optional, Set
+
+from models import SLORecord
+
+
+# 单个订阅者积压的消息上限，慢客户端超出后丢弃最旧的消息
+_QUEUE_SIZE = 256
+
+
+class Subscription:
+    def __init__(self, loop: asyncio.AbstractEventLoop, projects: Optional[Set[str]]):
+        self.loop = loop
+        self.projects = projects
+        self.queue: "asyncio.Queue[str]" = asyncio.Queue(maxsize=_QUEUE_SIZE)
+
+    def wants(self, project_ms_id: str) -> bool:
+        return self.projects is None or project_ms_id in self.projects
+
+    def _put(self, message: str) -> None:
+        # 在订阅者的事件循环中执行
+        if self.queue.full():
+            self.queue.get_nowait()
+        self.queue.put_nowait(message)
+
+
+_lock = threading.Lock()
+_subscribers: List[Subscription] = []
+
+
+def subscribe(projects: Optional[Iterable[str]] = None) -> Subscription:
+    """
+    在当前事件循环中订阅变更消息
+
+    Args:
+        projects: 只接收这些项目的消息，None表示全部项目
+    """
+    sub = Subscription(asyncio.get_running_loop(), set(projects) if projects else None)
+    with _lock:
+        _subscribers.append(sub)
+    return sub
+
+
+def unsubscribe(sub: Subscription) -> None:
+    with _lock:
+        if sub in _subscribers:
+            _subscribers.remove(sub)
+
+
+def subscriber_count() -> int:
+    with _lock:
+        return len(_subscribers)
+
+
+def publish(event: str, project_ms_id: str, data: dict) -> int:
+    """
+    发布一条变更消息，返回投递的订阅者数量
+    """
+    with _lock:
+        targets = [sub for sub in _subscribers if sub.wants(project_ms_id)]
+    if not targets:
+        return 0
+
+    body = json.dumps({"project_ms_id": project_ms_id, **data}, ensure_ascii=False, default=str)
+    message = f"event: {event}\ndata: {body}\n\n"
+    delivered = 0
+    for sub in targets:
+        try:
+            sub.loop.call_soon_threadsafe(sub._put, message)
+            delivered += 1
+        except RuntimeError:
+            # 事件循环已关闭，连接已断开
+            unsubscribe(sub)
+    return delivered
+
+
+def _period_bounds(period_type: str, period_value: str):
+    if period_type == "monthly":
+        year, month = (int(x) for x in period_value.split("-"))
+        start = datetime(year, month, 1)
+        end = datetime(year + 1, 1, 1) if month == 12 else datetime(year, month + 1, 1)
+    else:
+        start = datetime(int(period_value), 1, 1)
+        end = datetime(int(period_value) + 1, 1, 1)
+    return start, end
+
+
+def publish_slo_record(record: SLORecord) -> int:
+    """
+    发布SLO记录的变更
+
+    burn_rate 为误差预算消耗与周期时间进度之比，大于1表示按当前速度周期结束前会耗尽预算
+    """
+    with _lock:
+        if not _subscribers:
+            return 0
+    start, end = _period_bounds(record.period_type, record.period_value)
+    now = datetime.utcnow()
+    elapsed_ratio = min(max((now - start).total_seconds() / (end - start).total_seconds(), 0.0), 1.0)
+    burn_rate = record.error_budget_consumption / elapsed_ratio if elapsed_ratio > 0 else None
+    return publish("slo", record.project_ms_id, {
+        "period_type": record.period_type,
+        "period_value": record.period_value,
+        "achievement_rate": record.achievement_rate,
+        "error_budget_consumption": record.error_budget_consumption,
+        "remaining_budget": 1.0 - record.error_budget_consumption,
+        "burn_rate": burn_rate,
+        "total_downtime_seconds": record.total_downtime_seconds,
+        "calculated_at": record.calculated_at.isoformat() if record.calculated_at else None,
+    })
@@ -0,0 +1,79 @@
+"""
+SLO后台刷新队列
+读接口发现SLO记录缺失或过期时入队，由后台线程计算，避免在请求中同步扫描拨测数据。
+同一 (项目, 周期类型, 周期值) 在排队期间只会入队一次。
+"""
+import os
+import queue
+import threading
+from datetime import datetime
+from typing import Optional, Set, Tuple
+
+from models import SLORecord
+from services.slo_calculator import recalculate_slo
+
+
+# 记录计算时间超过该秒数视为过期，读取时触发后台刷新
+SLO_STALE_SECONDS = int(os.getenv("SLO_STALE_SECONDS", "300"))
+
+
+_queue: "queue.Queue[Tuple[str, str, str]]" = queue.Queue()
+_pending: Set[Tuple[str, str, str]] = set()
+_lock = threading.Lock()
+
+
+def enqueue_slo_refresh(project_ms_id: str, period_type: str, period_value: str) -> bool:
+    """
+    将SLO计算加入后台队列
+
+    Returns:
+        是否新入队（已在队列中则返回False）
+    """
+    key = (project_ms_id, period_type, period_value)
+    with _lock:
+        if key in _pending:
+            return False
+        _pending.add(key)
+    _queue.put(key)
+    return True
+
+
+def record_age_seconds(record: Optional[SLORecord]) -> Optional[float]:
+    if record is None or record.calculated_at is None:
+        return None
+    return max((datetime.utcnow() - record.calculated_at).total_seconds(), 0.0)
+
+
+def refresh_if_stale(project_ms_id: str, period_type: str, period_value: str, record: Optional[SLORecord]) -> bool:
+    """
+    记录缺失或过期时加入后台刷新队列（stale-while-revalidate），不阻塞当前请求
+
+    Returns:
+        当前记录是否缺失或过期
+    """
+    age = record_age_seconds(record)
+    if age is not None and age <= SLO_STALE_SECONDS:
+        return False
+    enqueue_slo_refresh(project_ms_id, period_type, period_value)
+    return True
+
+
+def _worker() -> None:
+    while True:
+        key = _queue.get()
+        # 出队即移除标记：计算期间的新写入可以再次入队，不会丢失
+        with _lock:
+            _pending.discard(key)
+        try:
+            recalculate_slo(*key)
+        except Exception as e:
+            print(f"Error refreshing SLO {key}: {e}")
+        finally:
+            _queue.task_done()
+
+
+def start_slo_refresh_worker(workers: int = 2) -> None:
+    """启动SLO后台刷新线程"""
+    for i in range(workers):
+        thread = threading.Thread(target=_worker, name=f"slo-refresh-{i}", daemon=True)
+        thread.start()
@@ -1,13 +1,19 @@
+import heapq
 import threading
 import time
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Dict, List, Optional, Tuple
 
+from sqlalchemy.exc import IntegrityError
 from sqlmodel import Session, select
 
 from db import engine
 from models import ProbeSyncConfig, ProbeResult, MSConfig, ProbeConfig
 from services.ms_client import MSClient
+from services import slo_events
+from services.probe_buckets import refresh_hourly_buckets_quietly
+from services.report_index import MISSING, UNKNOWN, ReportIndex, get_report_index, result_fingerprint
+from services.slo_refresh import enqueue_slo_refresh
 
 
 def _now_ms() -> int:
@@ -25,12 +31,10 @@ def _ensure_client(session: Session) -> Optional[MSClient]:
     return MSClient(base_url=ms_cfg.url, ak=ms_cfg.ak, sk=ms_cfg.sk)
 
 
-def _upsert_result(session: Session, project_ms_id: str, item: dict) -> None:
-    report_id = str(item.get("id"))
-    rec = session.exec(select(ProbeResult).where(ProbeResult.report_id == report_id)).first()
-    payload = dict(
+def _result_payload(project_ms_id: str, item: dict) -> dict:
+    return dict(
         project_ms_id=str(project_ms_id),
-        report_id=report_id,
+        report_id=str(item.get("id")),
         name=item.get("name") or "",
         start_time=datetime.utcfromtimestamp(int(item.get("startTime") or 0) / 1000),
         end_time=datetime.utcfromtimestamp(int(item.get("endTime") or 0) / 1000),
@@ -39,94 +43,369 @@ def _upsert_result(session: Session, project_ms_id: str, item: dict) -> None:
         error_count=item.get("errorCount"),
         success_count=item.get("successCount"),
     )
+
+
+class WrittenReports:
+    """What one ingest/sync run actually wrote: row count, SLO periods touched and the newest report."""
+
+    def __init__(self) -> None:
+        self.saved = 0
+        self.periods: set = set()
+        self.first: Optional[datetime] = None
+        self.last: Optional[datetime] = None
+        self.latest: Optional[dict] = None
+
+    def add(self, payload: dict) -> None:
+        started = payload["start_time"]
+        self.saved += 1
+        self.periods.add(("monthly", f"{started.year}-{started.month:02d}"))
+        self.periods.add(("yearly", str(started.year)))
+        if self.first is None or started < self.first:
+            self.first = started
+        if self.last is None or started >= self.last:
+            self.last = started
+            self.latest = payload
+
+
+def upsert_result(
+    session: Session,
+    project_ms_id: str,
+    item: dict,
+    index: Optional[ReportIndex] = None,
+    pending: Optional[List[Tuple[str, datetime, str]]] = None,
+) -> bool:
+    """Stage an insert/update for one report. Returns False when the stored row is unchanged.
+
+    With an index the insert/skip decision needs no SELECT; only changed
+    reports and possible hits on older data are looked up. Nothing is
+    committed here; callers commit once per batch and only then apply the
+    (report_id, start_time, fingerprint) entries collected in ``pending``
+    to the index, so a failed commit never marks a report as stored.
+    """
+    payload = _result_payload(project_ms_id, item)
+    report_id = payload["report_id"]
+    fingerprint = result_fingerprint(payload)
+    known = index.lookup(session, report_id, payload["start_time"]) if index is not None else UNKNOWN
+    if known == fingerprint:
+        return False
+    rec = None
+    if known != MISSING:
+        rec = session.exec(select(ProbeResult).where(ProbeResult.report_id == report_id)).first()
     if rec is None:
         rec = ProbeResult(**payload, created_at=_dt_now())
+    elif result_fingerprint(rec) == fingerprint:
+        if pending is not None:
+            pending.append((report_id, rec.start_time, fingerprint))
+        return False
     else:
         for k, v in payload.items():
             setattr(rec, k, v)
     session.add(rec)
-    session.commit()
+    if pending is not None:
+        pending.append((report_id, payload["start_time"], fingerprint))
+    return True
+
+
+def _commit_batch(
+    session: Session,
+    project_ms_id: str,
+    items: list,
+    index: ReportIndex,
+    written: Optional[WrittenReports] = None,
+) -> int:
+    """Upsert one fetched page and commit it; returns the number of rows written.
+
+    Rows are added to ``written`` only once their commit succeeded.
+    """
+    changed: list = []
+    pending: List[Tuple[str, datetime, str]] = []
+    try:
+        for item in items:
+            if upsert_result(session, project_ms_id, item, index, pending):
+                changed.append(item)
+        if changed:
+            session.commit()
+    except IntegrityError:
+        # a concurrent writer beat us to an insert: drop the index and redo the page row by row
+        session.rollback()
+        index.reset()
+        pending = []
+        changed = [item for item in items if upsert_result(session, project_ms_id, item)]
+        if changed:
+            session.commit()
+    except Exception:
+        # nothing of this page is known to be stored any more
+        session.rollback()
+        index.reset()
+        raise
+    for report_id, start_time, fingerprint in pending:
+        index.remember(report_id, start_time, fingerprint)
+    if written is not None:
+        for item in changed:
+            written.add(_result_payload(project_ms_id, item))
+    return len(changed)
+
 
+PAGE_SIZE_MIN = 25
+PAGE_SIZE_MAX = 400
+PAGE_LATENCY_TARGET = 2.0  # seconds per page fetch
 
-def _sync_window(session: Session, client: MSClient, project_ms_id: str, start_ms: int, end_ms: int) -> int:
-    page = 1
-    page_size = 100
+# last page size that worked for each project, reused by the next window
+_page_sizes: Dict[str, int] = {}
+
+
+def _adapt_page_size(page_size: int, elapsed: float, offset: int) -> int:
+    """Halve the page on slow responses, double it on fast ones.
+
+    Sizes stay PAGE_SIZE_MIN * 2^k and only grow on an aligned offset, so
+    offset // page_size + 1 always addresses the next unread page.
+    """
+    if elapsed > PAGE_LATENCY_TARGET and page_size > PAGE_SIZE_MIN:
+        return page_size // 2
+    if elapsed < PAGE_LATENCY_TARGET / 4 and page_size < PAGE_SIZE_MAX and offset % (page_size * 2) == 0:
+        return page_size * 2
+    return page_size
+
+
+def sync_window(
+    session: Session,
+    client: MSClient,
+    project_ms_id: str,
+    start_ms: int,
+    end_ms: int,
+    max_pages: Optional[int] = None,
+    written: Optional[WrittenReports] = None,
+) -> int:
+    """Pull every report in [start_ms, end_ms] and return the number of rows written."""
+    index = get_report_index(project_ms_id)
+    with index.lock:
+        try:
+            saved = _sync_pages(session, client, project_ms_id, start_ms, end_ms, index, max_pages, written)
+        except Exception:
+            index.reset()
+            raise
+    return saved
+
+
+def _sync_pages(
+    session: Session,
+    client: MSClient,
+    project_ms_id: str,
+    start_ms: int,
+    end_ms: int,
+    index: ReportIndex,
+    max_pages: Optional[int],
+    written: Optional[WrittenReports],
+) -> int:
+    page_size = _page_sizes.get(project_ms_id, 100)
+    offset = 0
+    pages = 0
     saved = 0
-    while True:
-        data = client.fetch_scenario_reports(project_id=project_ms_id, start_time_ms=start_ms, end_time_ms=end_ms, page=page, page_size=page_size)
+    index.prepare(session, datetime.utcfromtimestamp(start_ms / 1000))
+    while max_pages is None or pages < max_pages:
+        started = time.monotonic()
+        data = client.fetch_scenario_reports(project_id=project_ms_id, start_time_ms=start_ms, end_time_ms=end_ms, page=offset // page_size + 1, page_size=page_size)
+        elapsed = time.monotonic() - started
         if data.get("code") != 100200:
             raise RuntimeError(f"MS response error: {data}")
         d = data.get("data") or {}
         page_list = d.get("list") or []
         total = int(d.get("total") or 0)
-        for item in page_list:
-            _upsert_result(session, project_ms_id, item)
-            saved += 1
-        if page * page_size >= total:
+        saved += _commit_batch(session, project_ms_id, page_list, index, written)
+        pages += 1
+        offset += page_size
+        if offset >= total:
             break
-        page += 1
+        page_size = _adapt_page_size(page_size, elapsed, offset)
+    _page_sizes[project_ms_id] = page_size
     return saved
 
 
-def _run_once(session: Session) -> None:
-    client = _ensure_client(session)
-    if client is None:
+def notify_written(project_ms_id: str, written: WrittenReports) -> None:
+    """Queue SLO refreshes for the periods that got new rows and push the events delta to screens."""
+    if not written.saved:
         return
-    now = _dt_now()
-    configs = session.exec(select(ProbeSyncConfig).where(ProbeSyncConfig.enabled == True)).all()  # noqa: E712
-    for cfg in configs:
-        due = False
-        if cfg.last_run_at is None:
-            due = True
+    for period_type, period_value in sorted(written.periods):
+        enqueue_slo_refresh(project_ms_id, period_type, period_value)
+    latest = written.latest
+    slo_events.publish("events", project_ms_id, {
+        "saved": written.saved,
+        "latest": {
+            "report_id": latest["report_id"],
+            "name": latest["name"],
+            "start_time": latest["start_time"].isoformat(),
+            "status": latest["status"],
+        },
+    })
+
+
+def ingest_reports(session: Session, project_ms_id: str, items: list) -> WrittenReports:
+    """Write pushed reports through the same index/upsert path as polling."""
+    written = WrittenReports()
+    items = [item for item in items if item.get("id") is not None]
+    if not items:
+        return written
+    index = get_report_index(project_ms_id)
+    starts = [datetime.utcfromtimestamp(int(item.get("startTime") or 0) / 1000) for item in items]
+    with index.lock:
+        if index.window_start is None:
+            index.prepare(session, min(starts))
+        _commit_batch(session, project_ms_id, items, index, written)
+    if written.saved:
+        refresh_hourly_buckets_quietly(session, project_ms_id, written.first, written.last)
+    return written
+
+
+def run_sync_config(session: Session, client: MSClient, cfg: ProbeSyncConfig, max_pages: Optional[int] = None) -> dict:
+    """Sync one project's window from its pointer up to now and advance the pointer.
+
+    The outcome is recorded on the config either way; errors are re-raised.
+    """
+    start_dt = cfg.last_synced_start or cfg.start_time
+    if start_dt is None:
+        probe = session.exec(select(ProbeConfig).where(ProbeConfig.project_ms_id == cfg.project_ms_id)).first()
+        if probe and probe.create_time:
+            start_dt = probe.create_time
         else:
-            due = now - cfg.last_run_at >= timedelta(seconds=cfg.interval_seconds)
-        if not due:
-            continue
-
-        start_dt = cfg.last_synced_start or cfg.start_time
-        if start_dt is None:
-            probe = session.exec(select(ProbeConfig).where(ProbeConfig.project_ms_id == cfg.project_ms_id)).first()
-            if probe and probe.create_time:
-                start_dt = probe.create_time
+            start_dt = datetime.utcfromtimestamp((_now_ms() - 3600 * 1000) / 1000)
+    start_ms = int(start_dt.timestamp() * 1000)
+    end_ms = _now_ms() + 1
+    written = WrittenReports()
+    try:
+        saved = sync_window(session, client, cfg.project_ms_id, start_ms, end_ms, max_pages=max_pages, written=written)
+        cfg.last_run_at = _dt_now()
+        cfg.last_status = "SUCCESS"
+        # update pointer to latest record startTime + 1ms if any saved
+        latest = session.exec(
+            select(ProbeResult)
+            .where(ProbeResult.project_ms_id == cfg.project_ms_id)
+            .order_by(ProbeResult.start_time.desc())
+        ).first()
+        if latest:
+            cfg.last_synced_start = latest.start_time + timedelta(milliseconds=1)
+        cfg.last_error = None
+        cfg.updated_at = _dt_now()
+        session.add(cfg)
+        session.commit()
+        if saved:
+            refresh_hourly_buckets_quietly(session, cfg.project_ms_id, start_dt, _dt_now())
+        notify_written(cfg.project_ms_id, written)
+        return {"saved": saved, "start": start_ms, "end": end_ms}
+    except Exception as e:  # noqa: BLE001
+        session.rollback()
+        cfg.last_run_at = _dt_now()
+        cfg.last_status = "ERROR"
+        cfg.last_error = str(e)
+        cfg.updated_at = _dt_now()
+        session.add(cfg)
+        session.commit()
+        # pages committed before the failure still count
+        notify_written(cfg.project_ms_id, written)
+        raise
+
+
+# pause before re-reading the schedule after the database could not be queried
+LOAD_RETRY_SECONDS = 30
+
+
+class SyncScheduler:
+    """Min-heap of (next due time, config id) for enabled ProbeSyncConfigs.
+
+    The runner thread sleeps exactly until the earliest job is due. The heap is
+    rebuilt from the database only when reload() is called, i.e. when a config
+    changes through the sync-config endpoints.
+    """
+
+    def __init__(self) -> None:
+        self._heap: List[Tuple[datetime, int]] = []
+        self._cond = threading.Condition()
+        self._dirty = True
+        # bumped on every reload so jobs finishing afterwards do not re-queue stale entries
+        self._generation = 0
+
+    def reload(self) -> None:
+        with self._cond:
+            self._dirty = True
+            self._cond.notify()
+
+    def _load(self) -> None:
+        with Session(engine) as session:
+            configs = session.exec(select(ProbeSyncConfig).where(ProbeSyncConfig.enabled == True)).all()  # noqa: E712
+        heap = []
+        for cfg in configs:
+            if cfg.last_run_at is None:
+                due = _dt_now()
             else:
-                start_dt = datetime.utcfromtimestamp((_now_ms() - 3600 * 1000) / 1000)
-        start_ms = int(start_dt.timestamp() * 1000)
-        end_ms = _now_ms() + 1
-        try:
-            _ = _sync_window(session, client, cfg.project_ms_id, start_ms, end_ms)
-            cfg.last_run_at = _dt_now()
-            cfg.last_status = "SUCCESS"
-            latest = session.exec(
-                select(ProbeResult)
-                .where(ProbeResult.project_ms_id == cfg.project_ms_id)
-                .order_by(ProbeResult.start_time.desc())
-            ).first()
-            if latest:
-                cfg.last_synced_start = latest.start_time + timedelta(milliseconds=1)
-            cfg.last_error = None
-            cfg.updated_at = _dt_now()
-            session.add(cfg)
-            session.commit()
-        except Exception as e:  # noqa: BLE001
-            cfg.last_run_at = _dt_now()
-            cfg.last_status = "ERROR"
-            cfg.last_error = str(e)
-            cfg.updated_at = _dt_now()
-            session.add(cfg)
-            session.commit()
+                due = cfg.last_run_at + timedelta(seconds=cfg.interval_seconds)
+            heap.append((due, cfg.id))
+        heapq.heapify(heap)
+        with self._cond:
+            self._heap = heap
 
+    def _next_job(self) -> Tuple[int, int]:
+        with self._cond:
+            while True:
+                if self._dirty:
+                    self._dirty = False
+                    self._generation += 1
+                    self._cond.release()
+                    try:
+                        self._load()
+                    except Exception as e:  # noqa: BLE001
+                        self._cond.acquire()
+                        # keep the reload pending and retry after a pause (or on the next reload())
+                        self._dirty = True
+                        print(f"Error loading sync schedule: {e}")
+                        self._cond.wait(LOAD_RETRY_SECONDS)
+                        continue
+                    self._cond.acquire()
+                    continue
+                if not self._heap:
+                    self._cond.wait()
+                    continue
+                wait = (self._heap[0][0] - _dt_now()).total_seconds()
+                if wait > 0:
+                    self._cond.wait(wait)
+                    continue
+                _, cfg_id = heapq.heappop(self._heap)
+                return cfg_id, self._generation
 
-def start_background_sync_loop(interval_seconds: int = 30) -> None:
-    def _loop() -> None:
-        while True:
+    def _reschedule(self, cfg_id: int, interval_seconds: int, generation: int) -> None:
+        with self._cond:
+            if generation == self._generation and not self._dirty:
+                heapq.heappush(self._heap, (_dt_now() + timedelta(seconds=interval_seconds), cfg_id))
+
+    def _run_job(self, cfg_id: int, generation: int) -> None:
+        with Session(engine) as session:
+            cfg = session.get(ProbeSyncConfig, cfg_id)
+            if cfg is None or not cfg.enabled:
+                return
+            interval_seconds = cfg.interval_seconds
             try:
-                with Session(engine) as session:
-                    _run_once(session)
+                client = _ensure_client(session)
+                if client is not None:
+                    run_sync_config(session, client, cfg)
             except Exception:
                 pass
-            time.sleep(interval_seconds)
+            finally:
+                self._reschedule(cfg_id, interval_seconds, generation)
 
-    t = threading.Thread(target=_loop, name="probe-sync-runner", daemon=True)
-    t.start()
+    def run_forever(self) -> None:
+        while True:
+            try:
+                cfg_id, generation = self._next_job()
+                self._run_job(cfg_id, generation)
+            except Exception:
+                time.sleep(1)
+
+
+scheduler = SyncScheduler()
 
 
+def reload_sync_schedule() -> None:
+    scheduler.reload()
+
+
+def start_background_sync_loop() -> None:
+    t = threading.Thread(target=scheduler.run_forever, name="probe-sync-runner", daemon=True)
+    t.start()